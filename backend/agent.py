@@ -1,22 +1,43 @@
 import os
+import re
+import asyncio
+import hashlib
 from typing import Annotated, Any
 from contextlib import asynccontextmanager
 
-from dotenv import load_dotenv
+import orjson
 from langchain.tools.retriever import create_retriever_tool
+from langchain_community.cache import SQLiteCache
 
 from langchain_openai import ChatOpenAI
 from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import StateGraph, START
+from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 from langgraph.prebuilt import ToolNode, tools_condition
 from typing_extensions import TypedDict, Optional
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages.utils import message_chunk_to_message
+from langchain_core.runnables import RunnableConfig
 
 from database.db_connection import db
 from api.routes import router
 from database import models_postgres as models
 from utils.promt import system_promptt
+from utils.semantic_cache import SemanticCache, CachedRetriever
+from config import (
+    logger,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    SEMANTIC_CACHE_TTL,
+    RETRIEVAL_CACHE_THRESHOLD,
+    RETRIEVAL_CACHE_MAX_ENTRIES,
+    HISTORY_WINDOW,
+    SUMMARY_MODEL,
+    AGENT_MODEL,
+    SMALL_MODEL,
+    ROUTER_MODEL,
+    LLM_CACHE_PATH,
+)
 from tools.Promotion_Calculator import calculate_promotion_eligibility
 from tools.Promotion_Table import get_promotion_calculation_table
 from tools.Form import parse_form_request_excel, fill_excel_form
@@ -30,6 +51,85 @@ class State(TypedDict):
     user_id: Optional[int]                    # Persist user_id across graph steps
     user_data: Optional[dict]                 # Complete user data (academic, leaves, training)
     conversation_id: Optional[int]            # Conversation ID for message persistence
+    summary: Optional[str]                    # Running summary of turns outside the history window
+    summarized_count: Optional[int]           # Number of compacted messages folded into summary
+    model_tier: Optional[str]                 # "small" or "full", chosen by the route node per question
+    user_data_msg: Optional[SystemMessage]    # Built user_data SystemMessage, reused across turns
+    user_data_key: Optional[str]              # Fingerprint of the user_data user_data_msg was built from
+
+
+# Small talk answered without any LLM call
+_SMALL_TALK = re.compile(
+    r"^\s*(?:(?P<greeting>hi|hello|hey|good (?:morning|afternoon|evening))"
+    r"|(?P<thanks>thanks|thank you|thx|ok(?:ay)? thanks?))[\s!.]*$",
+    re.IGNORECASE,
+)
+_SMALL_TALK_REPLIES = {
+    "greeting": "Hello! How can I help you with GIU HR policies today?",
+    "thanks": "You're welcome! Anything else about GIU HR policies?",
+}
+
+_ROUTER_PROMPT = (
+    "You route questions for a university HR assistant. Reply with exactly one word.\n"
+    "SIMPLE: a short follow-up or clarification that needs at most one obvious tool call "
+    "and no multi-step reasoning.\n"
+    "COMPLEX: anything involving policy interpretation, eligibility, calculations, "
+    "forms, or several steps.\n\n"
+    "Question: "
+)
+
+
+# The system prompt never changes, so the message is built once at import time
+SYSTEM_MSG = SystemMessage(content=system_promptt)
+
+
+def _user_data_message(user_data: dict) -> SystemMessage:
+    """Build the user_data personalization message (stored in state per conversation)."""
+    return SystemMessage(content=f"USER DATA for personalization:\n{user_data}")
+
+
+def _user_data_key(user_data: dict) -> str:
+    """Content fingerprint of user_data, to tell when user_data_msg is stale."""
+    encoded = orjson.dumps(user_data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(encoded, digest_size=16).hexdigest()
+
+
+def _response_cache_scope(state: "State", config: RunnableConfig) -> Optional[tuple]:
+    """
+    Scope of the response cache: one conversation (thread) of one user.
+    None (cache disabled) when the run has no thread.
+    """
+    thread_id = (config or {}).get("configurable", {}).get("thread_id")
+    if thread_id is None:
+        return None
+    return state.get("user_id"), thread_id
+
+
+def _compact_history(messages: list) -> tuple[list, list]:
+    """
+    Split conversation messages into (prior turns, current turn).
+
+    Tool traffic of prior turns has already been answered by an AI follow-up,
+    so ToolMessages and tool-call-only AIMessages are dropped from them.
+    The current turn (latest HumanMessage onward) is kept verbatim.
+    """
+    start = 0
+    for i in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[i], HumanMessage):
+            start = i
+            break
+
+    prior = []
+    for msg in messages[:start]:
+        if isinstance(msg, ToolMessage):
+            continue
+        if isinstance(msg, AIMessage) and msg.tool_calls:
+            if not msg.content:
+                continue
+            msg = AIMessage(content=msg.content, id=msg.id)
+        prior.append(msg)
+
+    return prior, messages[start:]
 
 
 def create_agent_graph(retriever):
@@ -42,13 +142,28 @@ def create_agent_graph(retriever):
     Returns:
         Compiled LangGraph agent graph
     """
+    # Share the policy index's embeddings client: query vectors match the
+    # index, and the HTTP connection warmed at startup is reused
+    embeddings = retriever.vectorstore.embeddings
+
+    # Similar policy queries (from any user) reuse earlier retrieved chunks
+    retriever = CachedRetriever(
+        retriever=retriever,
+        cache=SemanticCache(
+            embeddings,
+            threshold=RETRIEVAL_CACHE_THRESHOLD,
+            max_entries=RETRIEVAL_CACHE_MAX_ENTRIES,
+        ),
+    )
+
     # Create retrieval tool
     retriever_tool = create_retriever_tool(
         retriever,
         "retrieve_policy_info",
         "Search and retrieve information from the GIU Admin Policy document. "
         "Use this tool to answer questions about GIU administrative policies, "
-        "procedures, regulations, and guidelines."
+        "procedures, regulations, and guidelines.",
+        response_format="content_and_artifact",
     )
 
     promotion_tool = calculate_promotion_eligibility
@@ -58,88 +173,231 @@ def create_agent_graph(retriever):
 
     tools = [retriever_tool, promotion_tool, promotion_table_tool, parse_request, fill_form]
 
-    # Initialize LLM with tool binding
-    llm = ChatOpenAI(model="gpt-5-mini", temperature=0)
+    # Built once: ToolNode indexes the tools by name at construction
+    tool_node = ToolNode(tools=tools)
+
+    # Initialize LLMs with tool binding (full model + cheaper tier for simple turns)
+    llm = ChatOpenAI(model=AGENT_MODEL, temperature=0)
     llm_with_tools = llm.bind_tools(tools)
+    small_llm_with_tools = ChatOpenAI(model=SMALL_MODEL, temperature=0).bind_tools(tools)
+
+    # Exact-match cache attached only to the router and summarizer below;
+    # the answering models and the form extractor never read it
+    llm_cache = None
+    if LLM_CACHE_PATH:
+        llm_cache = SQLiteCache(database_path=LLM_CACHE_PATH)
+        logger.info("LLM exact-match cache enabled at %s", LLM_CACHE_PATH)
+
+    # One-word classifier; never streamed to the user
+    router_llm = ChatOpenAI(
+        model=ROUTER_MODEL, temperature=0, max_tokens=3, disable_streaming=True, cache=llm_cache
+    )
+
+    # Cache of final answers, scoped per conversation. Only context-free
+    # answers are stored (see chatbot), so a hit never depends on earlier
+    # turns, the user's data or tool output.
+    response_cache = SemanticCache(
+        embeddings,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+        ttl=SEMANTIC_CACHE_TTL,
+    )
+
+    def last_human_text(state: State) -> Optional[str]:
+        """Return the text of the latest HumanMessage in the conversation."""
+        for msg in reversed(state["messages"]):
+            if isinstance(msg, HumanMessage):
+                return msg.content if isinstance(msg.content, str) else None
+        return None
 
-    def build_llm_messages(state: State, system_prompt: str):
+    # Cheap model used only to fold old turns into the running summary.
+    # Tagged so its tokens are not streamed to the user as the answer.
+    summarizer = ChatOpenAI(
+        model=SUMMARY_MODEL, temperature=0, disable_streaming=True, cache=llm_cache
+    ).with_config(tags=["summarizer"])
+
+    async def summarize(previous: Optional[str], messages: list) -> str:
+        """Fold `messages` into the previous running summary."""
+        transcript = "\n".join(
+            f"{msg.type}: {msg.content}" for msg in messages if isinstance(msg.content, str)
+        )
+        prompt = (
+            "Update the running summary of an HR assistant conversation. "
+            "Keep facts, numbers, dates and decisions; drop pleasantries. "
+            "Answer with the summary only.\n\n"
+            f"Current summary:\n{previous or '(empty)'}\n\n"
+            f"New messages:\n{transcript}"
+        )
+        return (await summarizer.ainvoke(prompt)).content
+
+    async def build_llm_messages(state: State):
         """
         Build the final ordered list of messages for LLM invocation.
         Includes:
-        - system prompt
-        - user_data injection
-        - conversation messages from state (HumanMessage, AIMessage, ToolMessage)
+        - system prompt + user_data injection (stable, cacheable prefix)
+        - running summary of turns outside the history window
+        - last HISTORY_WINDOW messages of prior turns + the current turn
+
+        Returns:
+            (messages, state updates for the running summary / user_data message)
+        """
+        updates = {}
+        messages = [SYSTEM_MSG]
+
+        # Reuse the built message while user_data is unchanged; rebuild it
+        # whenever fresh user_data (from any entry point) differs
+        user_data = state.get("user_data")
+        user_data_msg = None
+        if user_data:
+            key = _user_data_key(user_data)
+            user_data_msg = state.get("user_data_msg")
+            if user_data_msg is None or state.get("user_data_key") != key:
+                user_data_msg = _user_data_message(user_data)
+                updates.update(user_data_msg=user_data_msg, user_data_key=key)
+            messages.append(user_data_msg)
+
+        prior, current = _compact_history(state["messages"])
+        overflow = prior[:-HISTORY_WINDOW] if len(prior) > HISTORY_WINDOW else []
+        recent = prior[len(overflow):]
+
+        # Overflow is folded into the summary in batches of HISTORY_WINDOW
+        # messages, so the extra (serial) summarizer call before the answer
+        # happens once per batch, not on every turn. Until a batch is full
+        # its messages are sent verbatim.
+        summary = state.get("summary")
+        summarized_count = state.get("summarized_count") or 0
+        pending = overflow[summarized_count:]
+        if len(pending) >= HISTORY_WINDOW:
+            try:
+                summary = await summarize(summary, pending)
+                updates.update(summary=summary, summarized_count=len(overflow))
+                pending = []
+            except Exception:
+                # Fall back to sending the unsummarized turns verbatim
+                logger.exception("Failed to summarize conversation history")
+        recent = pending + recent
+
+        if summary:
+            messages.append(SystemMessage(content=f"Summary of earlier conversation:\n{summary}"))
+
+        messages.extend(recent)
+        messages.extend(current)
+
+        return messages, updates
+
+    # Define the routing node
+    async def route(state: State, config: RunnableConfig):
         """
-        messages = []
-        
-        # 1) System prompt ALWAYS first
-        messages.append(SystemMessage(content=system_prompt))
-        
-        # 2) Add user_data if exists
-        if state.get("user_data"):
-            messages.append(
-                SystemMessage(
-                    content=f"USER DATA for personalization:\n{state['user_data']}"
-                )
-            )
-        
-        # 3) Add real conversation messages
-        # LangGraph ensures these are always BaseMessage objects
-        for msg in state["messages"]:
-            messages.append(msg)
-        
-        return messages
+        Pick how a new question is answered: canned small-talk reply,
+        cached answer to a near-duplicate question, small model, or the
+        full agent model.
+        """
+        last = state["messages"][-1]
+        text = last.content if isinstance(last.content, str) else ""
+
+        small_talk = _SMALL_TALK.match(text)
+        if small_talk:
+            return {"messages": [AIMessage(content=_SMALL_TALK_REPLIES[small_talk.lastgroup])], "model_tier": None}
+
+        # Checked before the router LLM so a hit skips every model call. The
+        # lookup is confined to this conversation, whose cache only holds
+        # context-free answers (see chatbot), so a hit cannot carry another
+        # conversation's context
+        scope = _response_cache_scope(state, config)
+        if text and isinstance(last, HumanMessage) and scope is not None:
+            try:
+                cached = await asyncio.to_thread(response_cache.lookup, scope, text)
+            except Exception:
+                logger.exception("Semantic cache lookup failed")
+                cached = None
+            if cached is not None:
+                return {"messages": [AIMessage(content=cached)], "model_tier": None}
+
+        try:
+            label = (await router_llm.ainvoke(_ROUTER_PROMPT + text)).content.strip().upper()
+        except Exception:
+            logger.exception("Router classification failed — using full model")
+            label = "COMPLEX"
+
+        return {"model_tier": "small" if label.startswith("SIMPLE") else "full"}
+
+    def route_condition(state: State) -> str:
+        """Go to END if route already answered, otherwise to chatbot."""
+        return END if isinstance(state["messages"][-1], AIMessage) else "chatbot"
 
     # Define the chatbot node
-    def chatbot(state: State):
+    async def chatbot(state: State, config: RunnableConfig):
         """
         Main agent node that decides whether to use tools or respond directly.
+
+        The LLM response is streamed so graph consumers (astream_events,
+        CopilotKit) receive tokens as they are generated.
         """
-        system_prompt = system_promptt
+        scope = _response_cache_scope(state, config)
+        question = last_human_text(state)
+
+        llm_messages, state_updates = await build_llm_messages(state)
 
-        llm_messages = build_llm_messages(state, system_prompt)
+        # LLM invocation (supports tools), accumulated from the token stream
+        response = None
+        model = small_llm_with_tools if state.get("model_tier") == "small" else llm_with_tools
+        async for chunk in model.astream(llm_messages):
+            response = chunk if response is None else response + chunk
+        response = message_chunk_to_message(response)
 
-        # LLM invocation (supports tools)
-        response = llm_with_tools.invoke(llm_messages)
+        # Only context-free final answers are cached: the first turn of the
+        # conversation, answered without tool output or the user's data, so
+        # the answer depends on nothing but the question
+        prior, current = _compact_history(state["messages"])
+        cacheable = (
+            scope is not None
+            and question
+            and not prior
+            and not state.get("user_data")
+            and not any(isinstance(msg, ToolMessage) for msg in current)
+            and not response.tool_calls
+            and isinstance(response.content, str)
+            and response.content
+        )
+        if cacheable:
+            try:
+                await asyncio.to_thread(response_cache.store, scope, question, response.content)
+            except Exception:
+                logger.exception("Semantic cache store failed")
 
         # LangGraph requires returning new messages
-        return {"messages": [response]}
+        return {"messages": [response], **state_updates}
 
     # Define a custom tool node that captures retrieved chunks
-    def retrieve_and_store(state: State):
+    async def retrieve_and_store(state: State):
         """
         Custom tool node that executes retrieval and stores chunks in state.
-        """
-        # Get the last message (which should have tool calls)
-        last_message = state["messages"][-1]
 
+        Tool calls run concurrently; retrieved documents come back as the
+        ToolMessage artifact so the retriever is queried only once per call.
+        """
         # Execute the tool calls
-        tool_node = ToolNode(tools=tools)
-        result = tool_node.invoke(state)
+        result = await tool_node.ainvoke(state)
+        tool_messages = result.get("messages", [])
 
         # Extract retrieved chunks if the retrieval tool was called
         retrieved_chunks = []
-        if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
-            for tool_call in last_message.tool_calls:
-                if tool_call.get("name") == "retrieve_policy_info":
-                    # Get the query that was used
-                    query = tool_call.get("args", {}).get("query", "")
-
-                    # Retrieve documents to get chunk details
-                    docs = retriever.invoke(query)
-
-                    # Format chunks for frontend display
-                    for i, doc in enumerate(docs):
-                        chunk_info = {
-                            "content": doc.page_content,
-                            "page": doc.metadata.get("page", "Unknown"),
-                            "source": doc.metadata.get("source", "GIU Policy"),
-                            "index": i + 1,
-                        }
-                        retrieved_chunks.append(chunk_info)
+        for msg in tool_messages:
+            if not isinstance(msg, ToolMessage) or msg.name != "retrieve_policy_info":
+                continue
+
+            # Format chunks for frontend display
+            for i, doc in enumerate(msg.artifact or []):
+                chunk_info = {
+                    "content": doc.page_content,
+                    "page": doc.metadata.get("page", "Unknown"),
+                    "source": doc.metadata.get("source", "GIU Policy"),
+                    "index": i + 1,
+                }
+                retrieved_chunks.append(chunk_info)
 
         return {
-            "messages": result.get("messages", []),
+            "messages": tool_messages,
             "retrieved_chunks": retrieved_chunks
         }
 
@@ -147,11 +405,13 @@ def create_agent_graph(retriever):
     graph_builder = StateGraph(State)
 
     # Add nodes
+    graph_builder.add_node("route", route)
     graph_builder.add_node("chatbot", chatbot)
     graph_builder.add_node("tools", retrieve_and_store)
 
     # Add edges
-    graph_builder.add_edge(START, "chatbot")
+    graph_builder.add_edge(START, "route")
+    graph_builder.add_conditional_edges("route", route_condition, ["chatbot", END])
     graph_builder.add_conditional_edges(
         "chatbot",
         tools_condition,  # If LLM makes a tool call, go to tools; otherwise END
@@ -0,0 +1,99 @@
+# api/chat.py
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessage, HumanMessage
+from pydantic import BaseModel
+
+from api.context import UserCtx, user_context
+from config import logger
+from utils.load_data import load_user_data
+from utils.message_persistence import message_writer
+from utils.thread_cache import resolve_conversation_id
+
+router = APIRouter(prefix="/chat", tags=["Chat"])
+
+
+class ChatStreamRequest(BaseModel):
+    message: str
+    thread_id: str
+
+
+def sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Events frame."""
+    return f"event: {event}\ndata: {orjson.dumps(data).decode()}\n\n"
+
+
+@router.post("/stream")
+async def stream_chat(payload: ChatStreamRequest, request: Request, ctx: UserCtx = Depends(user_context)):
+    """
+    Run the agent graph for one user message and stream the answer as SSE.
+
+    Frames:
+    - event: delta  data: {"text": "..."}   one per generated token chunk
+    - event: done   data: {"text": "..."}   the full final answer
+    - event: error  data: {"detail": "..."}
+    """
+    graph = getattr(request.app.state, "graph", None)
+    if graph is None:
+        raise HTTPException(status_code=503, detail="Agent is not initialized yet")
+
+    # The caller comes from the request context (as on the CopilotKit path),
+    # never from the body. The thread must resolve to a conversation that
+    # caller owns; otherwise its checkpointed history and messages belong to
+    # someone else.
+    user_id = ctx.user_id
+    conversation_id = await resolve_conversation_id(user_id, payload.thread_id)
+    if conversation_id is None:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+
+    state = {"messages": [HumanMessage(content=payload.message)], "conversation_id": conversation_id}
+    if user_id is not None:
+        state["user_id"] = user_id
+        state["user_data"] = await load_user_data(user_id)
+
+    config = {"configurable": {"thread_id": payload.thread_id}}
+
+    async def event_stream():
+        streamed = False
+        answer = ""
+        try:
+            async for event in graph.astream_events(state, config, version="v2"):
+                if event["event"] != "on_chat_model_stream":
+                    continue
+                if event.get("metadata", {}).get("langgraph_node") != "chatbot":
+                    continue
+                if "summarizer" in event.get("tags", []):
+                    continue
+
+                text = event["data"]["chunk"].content
+                if isinstance(text, str) and text:
+                    streamed = True
+                    yield sse("delta", {"text": text})
+
+            # Final answer comes from the checkpointed state (also covers cached
+            # answers, which are returned without generating tokens)
+            snapshot = await graph.aget_state(config)
+            final = snapshot.values.get("messages", [])[-1:]
+            answer = final[0].content if final and isinstance(final[0], AIMessage) else ""
+
+            if answer and not streamed:
+                yield sse("delta", {"text": answer})
+            yield sse("done", {"text": answer})
+        except Exception as e:
+            logger.exception("Error while streaming agent response")
+            yield sse("error", {"detail": str(e)})
+        finally:
+            # Question and answer are queued together after the stream for the
+            # background writer, so persistence adds no round-trip before the
+            # first token or after the last; a client disconnect still runs this
+            rows = [("user", {"text": payload.message})]
+            if answer:
+                rows.append(("assistant", {"text": answer}))
+            message_writer.enqueue(conversation_id, rows)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
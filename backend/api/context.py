@@ -0,0 +1,51 @@
+# api/context.py
+import uuid
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Request
+
+from config import logger
+
+
+@dataclass(frozen=True)
+class UserCtx:
+    """Caller identity resolved from the request headers/cookies."""
+    user_id: Optional[int]
+    thread_id: str
+
+
+def _parse_user_id(value: Optional[str]) -> Optional[int]:
+    if not value:
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring non-numeric user id: %s", value)
+        return None
+
+
+async def user_context(request: Request) -> UserCtx:
+    """
+    Resolve user_id (x-copilotkit-user-id header > user_id cookie) and
+    thread_id (x-copilotkit-thread-id header, generated when missing).
+
+    Usable as a FastAPI dependency. The result is stored on request.state, so
+    every later call for the same request reuses it instead of re-parsing.
+    """
+    ctx = getattr(request.state, "user_ctx", None)
+    if ctx is not None:
+        return ctx
+
+    user_id = _parse_user_id(
+        request.headers.get("x-copilotkit-user-id") or request.cookies.get("user_id")
+    )
+
+    thread_id = request.headers.get("x-copilotkit-thread-id")
+    if not thread_id:
+        thread_id = f"thread_{uuid.uuid4().hex[:16]}"
+        logger.warning("No thread_id provided — generated new: %s", thread_id)
+
+    ctx = UserCtx(user_id=user_id, thread_id=thread_id)
+    request.state.user_ctx = ctx
+    return ctx
@@ -1,25 +1,70 @@
-# api/conversations.py — DEBUG / VERBOSE
-from fastapi import APIRouter, HTTPException
+# api/conversations.py
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from database.db_connection import db
 from datetime import datetime
 import uuid
-import json
 import traceback
 from config import logger
+from utils.load_data import invalidate_user_data
+from utils.thread_cache import invalidate_thread
 
 router = APIRouter(prefix="/conversations", tags=["Conversations"])
 
-def dbg(title: str, payload=None):
-    logger.info("\n" + "-" * 72)
-    logger.info(f"🟦 {title}")
-    if payload is not None:
-        try:
-            logger.info(f"payload: {payload}")
-        except Exception:
-            logger.info("payload: <unserializable>")
-    logger.info("-" * 72 + "\n")
+# SQL kept as module constants so the driver sees identical text every call
+# and reuses its prepared statements
+CREATE_CONVERSATION_SQL = """
+INSERT INTO conversations (user_id, title, thread_id)
+VALUES (:user_id, :title, :thread_id)
+RETURNING *
+"""
+
+USER_CONVERSATIONS_ALL_SQL = """
+SELECT * FROM conversations
+WHERE user_id = :user_id
+ORDER BY updated_at DESC
+LIMIT :limit OFFSET :offset
+"""
+
+USER_CONVERSATIONS_ACTIVE_SQL = """
+SELECT * FROM conversations
+WHERE user_id = :user_id AND is_active = TRUE
+ORDER BY updated_at DESC
+LIMIT :limit OFFSET :offset
+"""
+
+GET_CONVERSATION_SQL = "SELECT * FROM conversations WHERE conversation_id = :id"
+
+GET_CONVERSATION_BY_THREAD_SQL = "SELECT * FROM conversations WHERE thread_id = :thread_id"
+
+SOFT_DELETE_CONVERSATION_SQL = """
+UPDATE conversations
+SET is_active = FALSE
+WHERE conversation_id = :id
+RETURNING conversation_id, user_id
+"""
+
+DELETE_CONVERSATION_SQL = "DELETE FROM conversations WHERE conversation_id = :id RETURNING conversation_id, user_id, thread_id"
+
+# Messages of one turn are inserted in one statement and share created_at,
+# so message_id (assigned in conversation order) breaks the tie
+CONVERSATION_MESSAGES_SQL = """
+SELECT * FROM messages
+WHERE conversation_id = :id
+ORDER BY created_at ASC, message_id ASC
+LIMIT :limit
+"""
+
+# Keyset pagination for long threads: seek past the last (created_at,
+# message_id) the client has instead of OFFSET, which scans every skipped row
+CONVERSATION_MESSAGES_AFTER_SQL = """
+SELECT * FROM messages
+WHERE conversation_id = :id
+  AND (created_at, message_id) > (CAST(:after AS TIMESTAMPTZ), CAST(:after_id AS INTEGER))
+ORDER BY created_at ASC, message_id ASC
+LIMIT :limit
+"""
 
 # Pydantic models
 class CreateConversationRequest(BaseModel):
@@ -46,27 +91,23 @@ class MessageResponse(BaseModel):
     message_id: int
     conversation_id: int
     role: str
-    content: str
+    content: Dict[str, Any]
     created_at: datetime
 
 
 @router.post("/", response_model=ConversationResponse)
 async def create_conversation(payload: CreateConversationRequest):
-    dbg("CREATE_CONVERSATION — RECEIVED", {"payload": payload.dict()})
+    logger.debug("CREATE_CONVERSATION — RECEIVED: payload=%s", payload)
     thread_id = f"thread_{uuid.uuid4().hex[:16]}"
-    query = """
-    INSERT INTO conversations (user_id, title, thread_id)
-    VALUES (:user_id, :title, :thread_id)
-    RETURNING *
-    """
+    query = CREATE_CONVERSATION_SQL
     try:
-        dbg("Executing SQL INSERT", {"query": query, "values": {"user_id": payload.user_id, "title": payload.title, "thread_id": thread_id}})
         conversation = await db.fetch_one(query=query, values={
             "user_id": payload.user_id,
             "title": payload.title,
             "thread_id": thread_id
         })
-        dbg("CREATE_CONVERSATION — DB RESULT", {"conversation": dict(conversation) if conversation else None})
+        logger.debug("CREATE_CONVERSATION — DB RESULT: conversation=%s", conversation)
+        invalidate_user_data(conversation["user_id"])
         return dict(conversation)
     except Exception as e:
         logger.error("Failed to create conversation")
@@ -75,19 +116,23 @@ async def create_conversation(payload: CreateConversationRequest):
 
 
 @router.get("/user/{user_id}", response_model=List[ConversationResponse])
-async def get_user_conversations(user_id: int, include_inactive: bool = False):
-    dbg("GET_USER_CONVERSATIONS — START", {"user_id": user_id, "include_inactive": include_inactive})
-    base_query = """
-    SELECT * FROM conversations
-    WHERE user_id = :user_id
-    """
-    if not include_inactive:
-        base_query += " AND is_active = TRUE"
-    base_query += " ORDER BY updated_at DESC"
+async def get_user_conversations(
+    user_id: int,
+    include_inactive: bool = False,
+    limit: int = Query(50, ge=1, le=200),
+    offset: int = Query(0, ge=0),
+):
+    logger.debug(
+        "GET_USER_CONVERSATIONS — START: user_id=%s include_inactive=%s limit=%s offset=%s",
+        user_id, include_inactive, limit, offset,
+    )
+    base_query = USER_CONVERSATIONS_ALL_SQL if include_inactive else USER_CONVERSATIONS_ACTIVE_SQL
     try:
-        dbg("Executing SQL SELECT", {"query": base_query, "values": {"user_id": user_id}})
-        conversations = await db.fetch_all(query=base_query, values={"user_id": user_id})
-        dbg("GET_USER_CONVERSATIONS — RESULT", {"count": len(conversations)})
+        conversations = await db.fetch_all(
+            query=base_query,
+            values={"user_id": user_id, "limit": limit, "offset": offset},
+        )
+        logger.debug("GET_USER_CONVERSATIONS — RESULT: count=%s", len(conversations))
         return [dict(conv) for conv in conversations]
     except Exception as e:
         logger.exception("Error fetching user conversations")
@@ -96,11 +141,11 @@ async def get_user_conversations(user_id: int, include_inactive: bool = False):
 
 @router.get("/{conversation_id}", response_model=ConversationResponse)
 async def get_conversation(conversation_id: int):
-    dbg("GET_CONVERSATION — START", {"conversation_id": conversation_id})
+    logger.debug("GET_CONVERSATION — START: conversation_id=%s", conversation_id)
     try:
-        query = "SELECT * FROM conversations WHERE conversation_id = :id"
+        query = GET_CONVERSATION_SQL
         conv = await db.fetch_one(query=query, values={"id": conversation_id})
-        dbg("GET_CONVERSATION — DB RESULT", {"conversation": dict(conv) if conv else None})
+        logger.debug("GET_CONVERSATION — DB RESULT: conversation=%s", conv)
         if not conv:
             raise HTTPException(status_code=404, detail="Conversation not found")
         return dict(conv)
@@ -113,11 +158,11 @@ async def get_conversation(conversation_id: int):
 
 @router.get("/thread/{thread_id}", response_model=ConversationResponse)
 async def get_conversation_by_thread(thread_id: str):
-    dbg("GET_CONVERSATION_BY_THREAD — START", {"thread_id": thread_id})
+    logger.debug("GET_CONVERSATION_BY_THREAD — START: thread_id=%s", thread_id)
     try:
-        query = "SELECT * FROM conversations WHERE thread_id = :thread_id"
+        query = GET_CONVERSATION_BY_THREAD_SQL
         conv = await db.fetch_one(query=query, values={"thread_id": thread_id})
-        dbg("GET_CONVERSATION_BY_THREAD — DB RESULT", {"conversation": dict(conv) if conv else None})
+        logger.debug("GET_CONVERSATION_BY_THREAD — DB RESULT: conversation=%s", conv)
         if not conv:
             raise HTTPException(status_code=404, detail="Conversation not found")
         return dict(conv)
@@ -130,7 +175,7 @@ async def get_conversation_by_thread(thread_id: str):
 
 @router.patch("/{conversation_id}", response_model=ConversationResponse)
 async def update_conversation(conversation_id: int, payload: UpdateConversationRequest):
-    dbg("UPDATE_CONVERSATION — START", {"conversation_id": conversation_id, "payload": payload.dict()})
+    logger.debug("UPDATE_CONVERSATION — START: conversation_id=%s payload=%s", conversation_id, payload)
     updates = []
     values = {"id": conversation_id}
     if payload.title is not None:
@@ -148,11 +193,12 @@ async def update_conversation(conversation_id: int, payload: UpdateConversationR
     RETURNING *
     """
     try:
-        dbg("Executing SQL UPDATE", {"query": query, "values": values})
+        logger.debug("Executing SQL UPDATE: values=%s", values)
         conversation = await db.fetch_one(query=query, values=values)
-        dbg("UPDATE_CONVERSATION — DB RESULT", {"conversation": dict(conversation) if conversation else None})
+        logger.debug("UPDATE_CONVERSATION — DB RESULT: conversation=%s", conversation)
         if not conversation:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        invalidate_user_data(conversation["user_id"])
         return dict(conversation)
     except HTTPException:
         raise
@@ -163,22 +209,16 @@ async def update_conversation(conversation_id: int, payload: UpdateConversationR
 
 @router.delete("/{conversation_id}")
 async def delete_conversation(conversation_id: int, soft_delete: bool = True):
-    dbg("DELETE_CONVERSATION — START", {"conversation_id": conversation_id, "soft_delete": soft_delete})
+    logger.debug("DELETE_CONVERSATION — START: conversation_id=%s soft_delete=%s", conversation_id, soft_delete)
     try:
-        if soft_delete:
-            query = """
-            UPDATE conversations
-            SET is_active = FALSE
-            WHERE conversation_id = :id
-            RETURNING conversation_id
-            """
-        else:
-            query = "DELETE FROM conversations WHERE conversation_id = :id RETURNING conversation_id"
-        dbg("Executing SQL DELETE/UPDATE", {"query": query, "values": {"id": conversation_id}})
+        query = SOFT_DELETE_CONVERSATION_SQL if soft_delete else DELETE_CONVERSATION_SQL
         result = await db.fetch_one(query=query, values={"id": conversation_id})
-        dbg("DELETE_CONVERSATION — DB RESULT", {"result": dict(result) if result else None})
+        logger.debug("DELETE_CONVERSATION — DB RESULT: result=%s", result)
         if not result:
             raise HTTPException(status_code=404, detail="Conversation not found")
+        invalidate_user_data(result["user_id"])
+        if not soft_delete:
+            invalidate_thread(result["thread_id"])
         return {"success": True, "message": "Conversation deleted", "conversation_id": result["conversation_id"]}
     except HTTPException:
         raise
@@ -188,19 +228,34 @@ async def delete_conversation(conversation_id: int, soft_delete: bool = True):
 
 
 @router.get("/{conversation_id}/messages", response_model=List[MessageResponse])
-async def get_conversation_messages(conversation_id: int, limit: int = 100):
-    dbg("GET_CONVERSATION_MESSAGES — START", {"conversation_id": conversation_id, "limit": limit})
+async def get_conversation_messages(
+    conversation_id: int,
+    limit: int = Query(100, ge=1, le=500),
+    after: Optional[datetime] = None,
+    after_id: Optional[int] = None,
+):
+    """
+    Return messages oldest first. Pass the `created_at` and `message_id` of
+    the last message received as `after` / `after_id` to fetch the next page.
+    """
+    logger.debug(
+        "GET_CONVERSATION_MESSAGES — START: conversation_id=%s limit=%s after=%s",
+        conversation_id, limit, after,
+    )
     try:
-        query = """
-        SELECT * FROM messages
-        WHERE conversation_id = :id
-        ORDER BY created_at ASC
-        LIMIT :limit
-        """
-        dbg("Executing SQL SELECT messages", {"query": query, "values": {"id": conversation_id, "limit": limit}})
-        messages = await db.fetch_all(query=query, values={"id": conversation_id, "limit": limit})
-        dbg("GET_CONVERSATION_MESSAGES — DB ROWS", {"rows": len(messages)})
+        values = {"id": conversation_id, "limit": limit}
+        if after is None:
+            query = CONVERSATION_MESSAGES_SQL
+        else:
+            if after_id is None:
+                raise HTTPException(status_code=400, detail="after_id is required with after")
+            query = CONVERSATION_MESSAGES_AFTER_SQL
+            values.update(after=after, after_id=after_id)
+        messages = await db.fetch_all(query=query, values=values)
+        logger.debug("GET_CONVERSATION_MESSAGES — DB ROWS: rows=%s", len(messages))
         return [dict(msg) for msg in messages]
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception("Error retrieving conversation messages")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1,39 +1,28 @@
 # backend/api/load_user_data.py
 from fastapi import APIRouter, HTTPException
-from typing import Any
+from fastapi.responses import ORJSONResponse
 from utils.load_data import load_user_data as _load_user_data
 from config import logger
-from database.db_connection import db
 
 router = APIRouter(prefix="/user", tags=["User"])
 
-def dbg(title: str, payload: Any = None):
-    logger.info("\n" + "-" * 72)
-    logger.info(f"📦 {title}")
-    if payload is not None:
-        try:
-            logger.info(f"payload: {payload}")
-        except Exception:
-            logger.info("payload: <unserializable>")
-    logger.info("-" * 72 + "\n")
-
 
 @router.get("/data/{user_id}")
 async def get_user_data(user_id: int):
     """
     Returns aggregated user data used to inject into the agent state.
-    Delegates to utils.load_user_data.load_user_data which performs DB queries.
+    Delegates to utils.load_data.load_user_data, which fetches everything
+    (including the existence check) in one query.
     """
-    dbg("GET_USER_DATA — START", {"user_id": user_id})
+    logger.debug("GET_USER_DATA — START: user_id=%s", user_id)
     try:
-        # ensure user exists (optional quick check)
-        user_check = await db.fetch_one("SELECT user_id FROM users WHERE user_id = :uid", {"uid": user_id})
-        if not user_check:
-            raise HTTPException(status_code=404, detail="User not found")
-
         data = await _load_user_data(user_id)
-        dbg("GET_USER_DATA — DONE", {"keys": list(data.keys())})
-        return data
+        if data.get("user") is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        logger.debug("GET_USER_DATA — DONE: keys=%s", data.keys())
+        # The bundle is already plain JSON values (decoded from jsonb), so it
+        # is encoded by orjson directly, skipping jsonable_encoder's walk
+        return ORJSONResponse(data)
     except HTTPException:
         raise
     except Exception as e:
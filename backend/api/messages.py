@@ -1,24 +1,78 @@
-# api/messages.py — DEBUG / VERBOSE
+# api/messages.py
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 from database.db_connection import db
-import json
 import traceback
 from config import logger
 
-router = APIRouter(prefix="/messages", tags=["Messages"])
-
-def dbg(title: str, payload=None):
-    logger.info("\n" + "-" * 72)
-    logger.info(f"🟩 {title}")
-    if payload is not None:
-        try:
-            logger.info(f"payload: {payload}")
-        except Exception:
-            logger.info("payload: <unserializable>")
-    logger.info("-" * 72 + "\n")
+router = APIRouter(prefix="/messages", tags=["Messages"], default_response_class=ORJSONResponse)
+
+# SQL kept as module constants so the driver sees identical text every call
+# and reuses its prepared statements
+CREATE_MESSAGE_SQL = """
+WITH conv AS (
+    UPDATE conversations
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE conversation_id = :conversation_id
+    RETURNING conversation_id
+)
+INSERT INTO messages (conversation_id, role, content)
+SELECT conversation_id, CAST(:role AS VARCHAR), CAST(:content AS JSONB)
+FROM conv
+RETURNING message_id, conversation_id, role, content, created_at
+"""
+
+GET_MESSAGES_SQL = """
+SELECT c.conversation_id AS conversation_exists,
+       m.message_id, m.conversation_id, m.role, m.content, m.created_at
+FROM conversations c
+LEFT JOIN LATERAL (
+    SELECT message_id, conversation_id, role, content, created_at
+    FROM messages
+    WHERE conversation_id = c.conversation_id
+    ORDER BY created_at ASC, message_id ASC
+    LIMIT :limit OFFSET :offset
+) m ON TRUE
+WHERE c.conversation_id = :conversation_id
+ORDER BY m.created_at ASC, m.message_id ASC
+"""
+
+GET_MESSAGE_SQL = """
+SELECT message_id, conversation_id, role, content, created_at
+FROM messages
+WHERE message_id = :id
+"""
+
+DELETE_MESSAGE_SQL = """
+WITH del AS (
+    DELETE FROM messages
+    WHERE message_id = :id
+    RETURNING conversation_id
+), conv AS (
+    UPDATE conversations
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE conversation_id IN (SELECT conversation_id FROM del)
+)
+SELECT conversation_id FROM del
+"""
+
+DELETE_ALL_MESSAGES_SQL = """
+WITH conv AS (
+    UPDATE conversations
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE conversation_id = :id
+    RETURNING conversation_id
+), del AS (
+    DELETE FROM messages
+    WHERE conversation_id IN (SELECT conversation_id FROM conv)
+)
+SELECT conversation_id FROM conv
+"""
+
+MESSAGE_COUNT_SQL = "SELECT COUNT(*) as count FROM messages WHERE conversation_id = :conversation_id"
 
 
 class MessageCreate(BaseModel):
@@ -55,45 +109,28 @@ class MessageResponse(BaseModel):
 
 @router.post("/", response_model=MessageResponse, status_code=201)
 async def create_message(payload: MessageCreate):
-    dbg("CREATE_MESSAGE — START", {"payload": payload.dict()})
-    # Validate conversation
-    try:
-        conv_check = await db.fetch_one(
-            "SELECT conversation_id FROM conversations WHERE conversation_id = :id",
-            {"id": payload.conversation_id}
-        )
-        dbg("CREATE_MESSAGE — conv_check", {"exists": bool(conv_check), "conv_check": dict(conv_check) if conv_check else None})
-        if not conv_check:
-            raise HTTPException(status_code=404, detail=f"Conversation {payload.conversation_id} not found")
+    logger.debug("CREATE_MESSAGE — START: payload=%s", payload)
+    valid_roles = ["user", "assistant", "system", "tool"]
+    if payload.role not in valid_roles:
+        raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}")
 
-        valid_roles = ["user", "assistant", "system", "tool"]
-        if payload.role not in valid_roles:
-            raise HTTPException(status_code=400, detail=f"Invalid role. Must be one of: {', '.join(valid_roles)}")
-
-        query = """
-        INSERT INTO messages (conversation_id, role, content)
-        VALUES (:conversation_id, :role, :content)
-        RETURNING message_id, conversation_id, role, content, created_at
-        """
+    try:
+        # Touch the conversation and insert the message in one round-trip;
+        # no row back means the conversation does not exist
+        query = CREATE_MESSAGE_SQL
         values = {
             "conversation_id": payload.conversation_id,
             "role": payload.role,
-            "content": json.dumps(payload.content, ensure_ascii=False)
+            "content": payload.content
         }
-        dbg("CREATE_MESSAGE — Executing INSERT", {"query": query, "values": values})
+        logger.debug("CREATE_MESSAGE — Executing INSERT: values=%s", values)
         message = await db.fetch_one(query=query, values=values)
-        dbg("CREATE_MESSAGE — INSERT RESULT", {"message": dict(message) if message else None})
-
-        await db.execute(
-            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE conversation_id = :id",
-            {"id": payload.conversation_id}
-        )
-        logger.debug("Conversation updated_at set")
+        logger.debug("CREATE_MESSAGE — INSERT RESULT: message=%s", message)
+        if not message:
+            raise HTTPException(status_code=404, detail=f"Conversation {payload.conversation_id} not found")
 
         result = dict(message)
-        if isinstance(result["content"], str):
-            result["content"] = json.loads(result["content"])
-        dbg("CREATE_MESSAGE — FINAL RETURN", {"result": result})
+        logger.debug("CREATE_MESSAGE — FINAL RETURN: result=%s", result)
         return result
     except HTTPException:
         raise
@@ -105,36 +142,23 @@ async def create_message(payload: MessageCreate):
 
 @router.get("/{conversation_id}", response_model=List[MessageResponse])
 async def get_messages(conversation_id: int, limit: int = 100, offset: int = 0):
-    dbg("GET_MESSAGES — START", {"conversation_id": conversation_id, "limit": limit, "offset": offset})
+    logger.debug("GET_MESSAGES — START: conversation_id=%s limit=%s offset=%s", conversation_id, limit, offset)
     try:
-        conv_check = await db.fetch_one(
-            "SELECT conversation_id FROM conversations WHERE conversation_id = :id",
-            {"id": conversation_id}
-        )
-        dbg("GET_MESSAGES — conv_check", {"exists": bool(conv_check)})
-        if not conv_check:
-            raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
-
-        query = """
-        SELECT message_id, conversation_id, role, content, created_at
-        FROM messages
-        WHERE conversation_id = :conversation_id
-        ORDER BY created_at ASC
-        LIMIT :limit OFFSET :offset
-        """
-        dbg("GET_MESSAGES — Executing SQL", {"query": query, "values": {"conversation_id": conversation_id, "limit": limit, "offset": offset}})
+        # LEFT JOIN from conversations so the existence check rides along:
+        # no rows -> unknown conversation, one NULL row -> no messages
+        query = GET_MESSAGES_SQL
         messages = await db.fetch_all(query=query, values={"conversation_id": conversation_id, "limit": limit, "offset": offset})
-        dbg("GET_MESSAGES — DB ROWS", {"count": len(messages)})
+        logger.debug("GET_MESSAGES — DB ROWS: count=%s", len(messages))
+        if not messages:
+            raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
         result = []
         for msg in messages:
+            if msg["message_id"] is None:
+                continue
             msg_dict = dict(msg)
-            if isinstance(msg_dict.get("content"), str):
-                try:
-                    msg_dict["content"] = json.loads(msg_dict["content"])
-                except Exception:
-                    logger.exception("Failed to json-decode message content")
+            del msg_dict["conversation_exists"]
             result.append(msg_dict)
-        dbg("GET_MESSAGES — FINAL", {"result_count": len(result)})
+        logger.debug("GET_MESSAGES — FINAL: result_count=%s", len(result))
         return result
     except HTTPException:
         raise
@@ -146,21 +170,15 @@ async def get_messages(conversation_id: int, limit: int = 100, offset: int = 0):
 
 @router.get("/single/{message_id}", response_model=MessageResponse)
 async def get_message(message_id: int):
-    dbg("GET_MESSAGE — START", {"message_id": message_id})
+    logger.debug("GET_MESSAGE — START: message_id=%s", message_id)
     try:
-        query = """
-        SELECT message_id, conversation_id, role, content, created_at
-        FROM messages
-        WHERE message_id = :id
-        """
+        query = GET_MESSAGE_SQL
         message = await db.fetch_one(query=query, values={"id": message_id})
-        dbg("GET_MESSAGE — DB RESULT", {"message": dict(message) if message else None})
+        logger.debug("GET_MESSAGE — DB RESULT: message=%s", message)
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
         result = dict(message)
-        if isinstance(result["content"], str):
-            result["content"] = json.loads(result["content"])
-        dbg("GET_MESSAGE — FINAL", {"result": result})
+        logger.debug("GET_MESSAGE — FINAL: result=%s", result)
         return result
     except HTTPException:
         raise
@@ -171,21 +189,14 @@ async def get_message(message_id: int):
 
 @router.delete("/{message_id}")
 async def delete_message(message_id: int, hard_delete: bool = False):
-    dbg("DELETE_MESSAGE — START", {"message_id": message_id, "hard_delete": hard_delete})
+    logger.debug("DELETE_MESSAGE — START: message_id=%s hard_delete=%s", message_id, hard_delete)
     try:
-        message = await db.fetch_one(
-            "SELECT message_id, conversation_id FROM messages WHERE message_id = :id",
-            {"id": message_id}
-        )
-        dbg("DELETE_MESSAGE — EXIST CHECK", {"message": dict(message) if message else None})
+        # Delete and touch the parent conversation in one round-trip
+        query = DELETE_MESSAGE_SQL
+        message = await db.fetch_one(query=query, values={"id": message_id})
         if not message:
             raise HTTPException(status_code=404, detail="Message not found")
-        conversation_id = message["conversation_id"]
-        query = "DELETE FROM messages WHERE message_id = :id"
-        dbg("DELETE_MESSAGE — Executing", {"query": query, "values": {"id": message_id}})
-        await db.execute(query=query, values={"id": message_id})
-        await db.execute("UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE conversation_id = :id", {"id": conversation_id})
-        dbg("DELETE_MESSAGE — DONE", {"message_id": message_id})
+        logger.debug("DELETE_MESSAGE — DONE: message_id=%s", message_id)
         return {"success": True, "message": "Message deleted permanently", "message_id": message_id}
     except HTTPException:
         raise
@@ -196,11 +207,11 @@ async def delete_message(message_id: int, hard_delete: bool = False):
 
 @router.get("/count/{conversation_id}")
 async def get_message_count(conversation_id: int):
-    dbg("GET_MESSAGE_COUNT — START", {"conversation_id": conversation_id})
+    logger.debug("GET_MESSAGE_COUNT — START: conversation_id=%s", conversation_id)
     try:
-        query = "SELECT COUNT(*) as count FROM messages WHERE conversation_id = :conversation_id"
+        query = MESSAGE_COUNT_SQL
         result = await db.fetch_one(query=query, values={"conversation_id": conversation_id})
-        dbg("GET_MESSAGE_COUNT — RESULT", {"count": result["count"] if result else None})
+        logger.debug("GET_MESSAGE_COUNT — RESULT: count=%s", result["count"] if result else None)
         return {"conversation_id": conversation_id, "message_count": result["count"] if result else 0}
     except Exception:
         logger.exception("GET_MESSAGE_COUNT — Exception")
@@ -209,17 +220,13 @@ async def get_message_count(conversation_id: int):
 
 @router.delete("/conversation/{conversation_id}/all")
 async def delete_all_messages(conversation_id: int):
-    dbg("DELETE_ALL_MESSAGES — START", {"conversation_id": conversation_id})
+    logger.debug("DELETE_ALL_MESSAGES — START: conversation_id=%s", conversation_id)
     try:
-        conv_check = await db.fetch_one("SELECT conversation_id FROM conversations WHERE conversation_id = :id", {"id": conversation_id})
-        dbg("DELETE_ALL_MESSAGES — conv_check", {"exists": bool(conv_check)})
-        if not conv_check:
+        query = DELETE_ALL_MESSAGES_SQL
+        conv = await db.fetch_one(query=query, values={"id": conversation_id})
+        if not conv:
             raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
-        query = "DELETE FROM messages WHERE conversation_id = :id"
-        dbg("DELETE_ALL_MESSAGES — Executing", {"query": query, "values": {"id": conversation_id}})
-        await db.execute(query=query, values={"id": conversation_id})
-        await db.execute("UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE conversation_id = :id", {"id": conversation_id})
-        dbg("DELETE_ALL_MESSAGES — DONE", {"conversation_id": conversation_id})
+        logger.debug("DELETE_ALL_MESSAGES — DONE: conversation_id=%s", conversation_id)
         return {"success": True, "message": "All messages deleted", "conversation_id": conversation_id}
     except HTTPException:
         raise
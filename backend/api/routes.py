@@ -1,20 +1,26 @@
 # backend/api/routes.py
 
 from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, Response
 from pydantic import BaseModel
+import asyncio
 import bcrypt
+import hashlib
+import hmac
 import os
+import time
 
 from database.db_connection import db
 
 # System modules (Excel workflow)
 from tools.Form import (FILLED_FORMS_DIR, fill_excel_form, parse_form_request_excel)
+from utils.promotion_table import PROMOTION_TABLE_JSON
 
 # Other backend routers
 from api.load_user_data import router as user_data_router
 from api.conversations import router as conversations_router
 from api.messages import router as messages_router
+from api.chat import router as chat_router
 
 
 # ======================================================
@@ -29,6 +35,32 @@ class LoginRequest(BaseModel):
     password: str
 
 
+# Recent bcrypt outcomes, so retry bursts with the same credentials do not
+# re-run the (deliberately slow) hash. Keyed on an HMAC of the password with
+# the stored hash, so a password change never hits a stale entry.
+LOGIN_CACHE_TTL = 5
+_login_cache: dict[tuple[str, bytes], tuple[float, bool]] = {}
+
+
+async def verify_password(email: str, password: str, stored_password: bytes) -> bool:
+    """Check a password against its bcrypt hash without blocking the event loop."""
+    password_bytes = password.encode("utf-8")
+    key = (email, hmac.new(stored_password, password_bytes, hashlib.sha256).digest())
+    now = time.monotonic()
+
+    cached = _login_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    ok = await asyncio.to_thread(bcrypt.checkpw, password_bytes, stored_password)
+
+    if len(_login_cache) > 1024:
+        for k in [k for k, (expires, _) in _login_cache.items() if expires <= now]:
+            del _login_cache[k]
+    _login_cache[key] = (now + LOGIN_CACHE_TTL, ok)
+    return ok
+
+
 @auth_router.post("/login")
 async def login_user(payload: LoginRequest):
     query = "SELECT * FROM users WHERE email = :email"
@@ -43,7 +75,7 @@ async def login_user(payload: LoginRequest):
         if isinstance(stored_password, str):
             stored_password = stored_password.encode("utf-8")
 
-        ok = bcrypt.checkpw(payload.password.encode("utf-8"), stored_password)
+        ok = await verify_password(payload.email, payload.password, stored_password)
 
     except Exception:
         raise HTTPException(status_code=500, detail="Server error during authentication")
@@ -89,17 +121,27 @@ async def login_user(payload: LoginRequest):
 files_router = APIRouter(prefix="/filled_forms", tags=["Files"])
 
 @files_router.get("/{filename}")
-def download_excel(filename: str):
+async def download_excel(filename: str):
     safe = os.path.basename(filename)
     path = FILLED_FORMS_DIR / safe
 
-    if not path.exists():
+    # One stat() for both the existence check and Content-Length
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
         raise HTTPException(404, detail="File not found")
 
+    # Async endpoint: the handler itself runs on the event loop rather than
+    # a threadpool worker; FileResponse then streams the file in chunks.
+    # The filename is reused per user/form type and overwritten on every
+    # generation, so clients must revalidate (FileResponse sets the ETag /
+    # Last-Modified from the stat) instead of reusing a stale copy.
     return FileResponse(
         path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        filename=safe
+        filename=safe,
+        stat_result=stat,
+        headers={"Cache-Control": "no-cache"}
     )
 
 
@@ -153,6 +195,22 @@ async def generate_form(request: FormGenerateRequest):
     }
 
 
+# ======================================================
+# PROMOTION ROUTER
+# ======================================================
+
+promotion_router = APIRouter(prefix="/promotion", tags=["Promotion"])
+
+@promotion_router.get("/table")
+async def get_promotion_table():
+    """Lecturer → Associate Professor criteria table, served pre-encoded."""
+    return Response(
+        content=PROMOTION_TABLE_JSON,
+        media_type="application/json",
+        headers={"Cache-Control": "public, max-age=3600"}
+    )
+
+
 # ======================================================
 # MAIN AGGREGATOR ROUTER
 # ======================================================
@@ -163,5 +221,7 @@ router.include_router(auth_router)
 router.include_router(user_data_router)
 router.include_router(conversations_router)
 router.include_router(messages_router)
+router.include_router(chat_router)
 router.include_router(files_router)
 router.include_router(forms_router)
+router.include_router(promotion_router)
@@ -22,9 +22,92 @@ FORMS_DIR = r"C:\Users\Yossef\Downloads\copilotkit_template\Forms"
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
 TOP_K_CHUNKS = 3
+
+# Embedding model for the policy index and queries: "openai" (API) or
+# "fastembed" (LOCAL_EMBEDDING_MODEL on CPU, no network calls; requires the
+# fastembed package). Switching provider rebuilds the saved index.
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "BAAI/bge-small-en-v1.5")
+
+# Chunks are embedded EMBEDDING_BATCH_SIZE texts per request, with at most
+# EMBEDDING_CONCURRENCY requests in flight
+EMBEDDING_BATCH_SIZE = 512
+EMBEDDING_CONCURRENCY = 8
+
+# Embedded policy chunks are saved here and reused on boot while the PDFs
+# (name, size, mtime) and chunk settings are unchanged
+INDEX_DIR = os.getenv("INDEX_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_cache"))
+
+# FAISS index for the policy chunks (cosine = inner product on unit vectors):
+# "hnsw_sq8" (HNSW graph over int8 scalar-quantized vectors, 4x smaller than
+# float32), "ivfpq" (inverted lists over product-quantized codes with an
+# exact float32 re-rank, for corpora of VECTOR_IVFPQ_MIN_CHUNKS or more;
+# smaller ones get "hnsw_sq8") or "flat" (exact float32 scan). A quantized
+# index whose sampled recall@10 against the exact scan falls below
+# VECTOR_MIN_RECALL is replaced by "flat" at build time. Changing the type
+# rebuilds the saved index.
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "hnsw_sq8")
+VECTOR_HNSW_M = 32
+VECTOR_EF_SEARCH = 64
+VECTOR_MIN_RECALL = 0.95
+VECTOR_IVFPQ_MIN_CHUNKS = 10_000
+VECTOR_PQ_M = 48                  # sub-quantizers (8 bits each); must divide the dimension
+VECTOR_IVF_NPROBE = 64            # of ~sqrt(chunks) inverted lists scanned per query
+VECTOR_REFINE_K_FACTOR = 8        # PQ candidates re-ranked exactly per result
 LLM_MODEL = "gpt-4o"
+
+# Model routing: ROUTER_MODEL classifies each new question; simple ones are
+# answered by SMALL_MODEL, everything else by AGENT_MODEL
+AGENT_MODEL = "gpt-5-mini"
+SMALL_MODEL = "gpt-4o-mini"
+ROUTER_MODEL = "gpt-4o-mini"
 LLM_TEMPERATURE = 0
 
+# Semantic response cache (near-duplicate questions skip the LLM)
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_MAX_ENTRIES = 256
+SEMANTIC_CACHE_TTL = 3600  # seconds
+
+# Retrieval cache (similar policy queries reuse earlier chunks, across users)
+RETRIEVAL_CACHE_THRESHOLD = 0.95
+RETRIEVAL_CACHE_MAX_ENTRIES = 1024
+
+# Exact-match LLM cache (same model, params and full prompt -> stored answer).
+# Attached only to the router and summarizer models (entries never expire);
+# set to "" to disable
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".langchain.cache.db"))
+
+# Conversation history sent to the LLM: the last HISTORY_WINDOW messages are
+# kept verbatim, older ones are folded into a running summary
+HISTORY_WINDOW = 8
+SUMMARY_MODEL = "gpt-4o-mini"
+
+# ===============================================
+# User Data Cache
+# ===============================================
+
+# Aggregated user data (profile, leaves, training, conversations) is served
+# from memory for this many seconds before Postgres is queried again
+USER_DATA_CACHE_TTL = 60
+USER_DATA_CACHE_MAX_ENTRIES = 10_000
+
+# ===============================================
+# Thread Cache
+# ===============================================
+
+# thread_id -> conversation_id lookups kept in memory (the mapping is fixed
+# once a conversation exists)
+THREAD_CACHE_TTL = 3600
+THREAD_CACHE_MAX_ENTRIES = 10_000
+
+# ===============================================
+# Message Persistence
+# ===============================================
+
+# conversations.updated_at is bumped by a message save at most once per this
+# many seconds per conversation (0 = on every save)
+CONVERSATION_TOUCH_INTERVAL = 5
+
 # ===============================================
 # CORS Configuration
 # ===============================================
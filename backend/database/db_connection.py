@@ -1,20 +1,103 @@
 # backend/database/db_connection.py
 import os
-from dotenv import load_dotenv
+from typing import Optional
+
+import asyncpg
+import orjson
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from databases import Database
 
-load_dotenv()  # loads .env in backend folder
+import config  # noqa: F401 — loads .env (once) before DATABASE_URL is read
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 if DATABASE_URL is None:
     raise RuntimeError("DATABASE_URL not set in .env")
 
-# For async operations (databases library)
-db = Database(DATABASE_URL)
+# jsonb's binary wire format is a version byte (1) followed by the JSON text
+_JSONB_VERSION = b"\x01"
+
+
+async def _init_connection(conn):
+    """
+    Decode json/jsonb columns to Python objects (and encode dicts bound to
+    json/jsonb parameters) with orjson on every pooled connection.
+
+    Binary format: orjson's UTF-8 bytes go to the wire as-is, with no
+    intermediate str to build on encode or decode.
+    """
+    await conn.set_type_codec(
+        "json",
+        encoder=orjson.dumps,
+        decoder=orjson.loads,
+        schema="pg_catalog",
+        format="binary",
+    )
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=lambda value: _JSONB_VERSION + orjson.dumps(value),
+        decoder=lambda data: orjson.loads(memoryview(data)[1:]),
+        schema="pg_catalog",
+        format="binary",
+    )
+
+
+# For async operations (databases library, asyncpg pool underneath).
+# Set DB_STATEMENT_CACHE_SIZE=0 when running behind PgBouncer in
+# transaction mode, which cannot share prepared statements.
+db = Database(
+    DATABASE_URL,
+    min_size=int(os.getenv("DB_POOL_MIN_SIZE", "5")),
+    max_size=int(os.getenv("DB_POOL_MAX_SIZE", "20")),
+    statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024")),
+    max_inactive_connection_lifetime=300,
+    server_settings={"jit": "off"},
+    init=_init_connection,
+)
+
+# Raw asyncpg pool for the few statements run on every chat message
+# (conversation upsert, message inserts). They skip the databases/SQLAlchemy
+# compile step, and asyncpg's statement cache prepares each one once per
+# connection, so later calls only send Bind/Execute.
+_raw_pool: Optional[asyncpg.Pool] = None
+
+
+async def connect_raw_pool():
+    global _raw_pool
+    _raw_pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=int(os.getenv("DB_RAW_POOL_MIN_SIZE", "2")),
+        max_size=int(os.getenv("DB_RAW_POOL_MAX_SIZE", "10")),
+        statement_cache_size=int(os.getenv("DB_STATEMENT_CACHE_SIZE", "1024")),
+        max_inactive_connection_lifetime=300,
+        server_settings={"jit": "off"},
+        init=_init_connection,
+    )
+
+
+async def close_raw_pool():
+    global _raw_pool
+    if _raw_pool is not None:
+        await _raw_pool.close()
+        _raw_pool = None
+
+
+def pg_acquire():
+    """Hold one raw pool connection (`async with pg_acquire() as conn:`)."""
+    return _raw_pool.acquire()
+
+
+async def pg_fetch(query: str, *args):
+    """Run a hot-path query ($1, $2 ... placeholders) on the raw pool."""
+    return await _raw_pool.fetch(query, *args)
+
+
+async def pg_fetchrow(query: str, *args):
+    """Like pg_fetch, returning the first row or None."""
+    return await _raw_pool.fetchrow(query, *args)
+
 
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+engine = create_engine(DATABASE_URL, pool_pre_ping=True, pool_recycle=1800)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
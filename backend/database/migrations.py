@@ -0,0 +1,102 @@
+# backend/database/migrations.py
+"""
+Startup schema migrations
+Idempotent index changes that existing databases need and
+Base.metadata.create_all cannot apply (it never touches existing tables).
+Each step checks the catalog first, so a migrated database pays only a few
+catalog lookups per boot.
+"""
+
+from database.db_connection import pg_acquire
+from config import logger
+
+
+# messages.copilot_message_id must be unique: message saves use it as the
+# ON CONFLICT target and fail outright while the index is missing
+MESSAGE_DEDUP_INDEX = "ux_messages_copilot_message_id"
+
+ADD_COPILOT_ID_COLUMN_SQL = """
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS copilot_message_id VARCHAR(255)
+"""
+
+# Keep the first stored copy of every copilot_message_id
+DELETE_DUPLICATE_MESSAGES_SQL = """
+DELETE FROM messages m
+USING messages older
+WHERE m.copilot_message_id IS NOT NULL
+  AND older.copilot_message_id = m.copilot_message_id
+  AND older.message_id < m.message_id
+"""
+
+# Read-path indexes (mirrors of the models' __table_args__):
+# - conversation list: WHERE user_id = ? [AND is_active] ORDER BY updated_at DESC
+# - message history: WHERE conversation_id = ? ORDER BY created_at, message_id
+#   (plus the keyset seek on that pair)
+READ_INDEXES = {
+    "ix_conversations_user_active_updated":
+        "ON conversations (user_id, is_active, updated_at DESC)",
+    "ix_messages_conversation_created_id":
+        "ON messages (conversation_id, created_at, message_id)",
+}
+
+# Superseded by ix_messages_conversation_created_id
+OBSOLETE_INDEXES = ("ix_messages_conversation_created",)
+
+INDEX_STATE_SQL = """
+SELECT i.indisvalid
+FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+WHERE c.relname = $1
+"""
+
+
+async def _index_state(conn, name: str):
+    """True/False for a valid/invalid (failed CONCURRENTLY build) index, None if absent."""
+    return await conn.fetchval(INDEX_STATE_SQL, name)
+
+
+async def _ensure_index(conn, name: str, definition: str, unique: bool = False, before=None):
+    state = await _index_state(conn, name)
+    if state:
+        return
+    if state is False:
+        # Left behind by an interrupted build: drop and rebuild
+        await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    if before is not None:
+        await before(conn)
+    logger.info("Creating index %s", name)
+    await conn.execute(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX CONCURRENTLY {name} {definition}"
+    )
+
+
+async def _dedup_messages(conn):
+    await conn.execute(ADD_COPILOT_ID_COLUMN_SQL)
+    deleted = await conn.execute(DELETE_DUPLICATE_MESSAGES_SQL)
+    logger.info("Removed duplicate messages before creating %s: %s", MESSAGE_DEDUP_INDEX, deleted)
+
+
+async def apply_migrations():
+    """
+    Bring an existing database's indexes up to date. Skipped when the tables
+    do not exist yet (fresh database without RUN_DDL).
+    """
+    # CONCURRENTLY cannot run inside a transaction block; asyncpg connections
+    # autocommit outside an explicit transaction
+    async with pg_acquire() as conn:
+        if await conn.fetchval("SELECT to_regclass('messages') IS NULL OR to_regclass('conversations') IS NULL"):
+            logger.warning("Tables missing — skipping index migrations")
+            return
+
+        await _ensure_index(
+            conn,
+            MESSAGE_DEDUP_INDEX,
+            "ON messages (copilot_message_id)",
+            unique=True,
+            before=_dedup_messages,
+        )
+        for name, definition in READ_INDEXES.items():
+            await _ensure_index(conn, name, definition)
+        for name in OBSOLETE_INDEXES:
+            if await _index_state(conn, name) is not None:
+                logger.info("Dropping superseded index %s", name)
+                await conn.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
@@ -1,6 +1,6 @@
 # backend/models.py
 from sqlalchemy import (
-    Column, Integer, String, DateTime, Boolean, Numeric, ForeignKey, Text
+    Column, Integer, String, DateTime, Boolean, Numeric, ForeignKey, Text, Index
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -105,6 +105,11 @@ class Conversation(Base):
     thread_id = Column(String(255), unique=True, index=True, nullable=False)
     is_active = Column(Boolean, default=True)
 
+    # Sidebar listing: WHERE user_id = ? AND is_active ORDER BY updated_at DESC
+    __table_args__ = (
+        Index("ix_conversations_user_active_updated", "user_id", "is_active", updated_at.desc()),
+    )
+
     # Relationship to user
     user = relationship("User", backref="conversations")
 
@@ -122,7 +127,17 @@ class Message(Base):
     conversation_id = Column(Integer, ForeignKey("conversations.conversation_id", ondelete="CASCADE"))
     role = Column(String(20), nullable=False)
     content = Column(JSONB, nullable=False)  # store as JSONB
+    copilot_message_id = Column(String(255))  # CopilotKit/LangChain message id, NULL if none
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
+    __table_args__ = (
+        # History reads: WHERE conversation_id = ? ORDER BY created_at, message_id
+        # (and the keyset seek on that pair)
+        Index("ix_messages_conversation_created_id", "conversation_id", "created_at", "message_id"),
+        # Dedup target for INSERT ... ON CONFLICT (copilot_message_id) DO NOTHING;
+        # NULLs never conflict, so messages without an id are always inserted
+        Index("ux_messages_copilot_message_id", "copilot_message_id", unique=True),
+    )
+
     # Relationship back to conversation
     conversation = relationship("Conversation", back_populates="messages")
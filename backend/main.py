@@ -6,14 +6,15 @@ This application uses:
 - LangGraph for agent orchestration with tool calling
 - CopilotKit for frontend integration
 - OpenAI embeddings for vectorization
-- In-memory vector store for document retrieval
+- FAISS vector store (int8-quantized HNSW, cosine) for document retrieval
 - Tool-calling pattern where the LLM decides when to query the PDF
 """
 
 import os
-from typing import Annotated, Any
+import asyncio
+import hashlib
 from contextlib import asynccontextmanager
-import logging
+from concurrent.futures import ProcessPoolExecutor
 
 from database.db_connection import engine, Base  # engine, Base are exported from db_connection.py
 import config
@@ -23,50 +24,29 @@ import uuid
 import traceback
 from starlette.requests import Request
 import uvicorn
-from dotenv import load_dotenv
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from langchain.tools.retriever import create_retriever_tool
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_community.vectorstores import DocArrayInMemorySearch
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.graph import StateGraph, START
-from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
-from typing_extensions import TypedDict, Optional
-from langchain_core.messages import SystemMessage
 
 from copilotkit import CopilotKitRemoteEndpoint, LangGraphAgent
 from copilotkit.integrations.fastapi import add_fastapi_endpoint
 
-from config import logger, folder_path
+from config import (
+    logger, folder_path, CHUNK_SIZE, CHUNK_OVERLAP, TOP_K_CHUNKS, INDEX_DIR,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_CONCURRENCY,
+)
 
-from database.db_connection import db
+from database.db_connection import db, connect_raw_pool, close_raw_pool
+from database.migrations import apply_migrations
 from api.routes import router
-from database import models_postgres as models
+from api.context import UserCtx, user_context
 from agent import create_agent_graph
-from utils.message_persistence import extract_message_content, save_langchain_message, message_type_to_role, save_message_to_db
-
-import json
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
-
-# Load environment variables
-load_dotenv()
-
-
-# Helper debug print wrapper (use logger.info but keep clear separators)
-def dbg(title: str, payload: dict = None):
-    logger.info("\n" + "=" * 88)
-    logger.info(f"🔶 {title}")
-    if payload is not None:
-        try:
-            logger.info(f"payload: {payload}")
-        except Exception:
-            logger.info("payload: <unserializable>")
-    logger.info("=" * 88 + "\n")
-
+from utils.thread_cache import resolve_conversation_id
+from utils.vector_store import build_vectorstore, load_vectorstore, VECTOR_INDEX_ID
+from utils.embeddings import create_embeddings, embeddings_id
+from utils.pdf_loader import load_and_split_pdf, PDF_LOADER_ID
+from utils.message_persistence import (
+    extract_message_content, message_type_to_role, message_writer, to_message_rows
+)
 
 
 # ============================================================
@@ -74,81 +54,18 @@ def dbg(title: str, payload: dict = None):
 # ============================================================
 class UserAwareLangGraphAgent(LangGraphAgent):
     async def invoke(self, data, request: Request = None):
-        dbg("UserAwareLangGraphAgent.invoke() — START", {"has_request": bool(request)})
+        logger.debug("UserAwareLangGraphAgent.invoke() — START: has_request=%s", bool(request))
         try:
-            # Extract user ID (header > cookie)
-            user_id = None
-            if request:
-                header_user = request.headers.get("x-copilotkit-user-id")
-                if header_user:
-                    user_id = header_user
-                    logger.debug(f"Header user id found: {header_user}")
-
-            cookie_user = request.cookies.get("user_id") if request else None
-            if not user_id and cookie_user:
-                user_id = cookie_user
-                logger.debug(f"Cookie user id found: {cookie_user}")
-
-            # Thread id (header)
-            thread_id = None
-            if request:
-                thread_id = request.headers.get("x-copilotkit-thread-id")
-                logger.debug(f"Thread id from header: {thread_id}")
-
-            if not thread_id:
-                thread_id = f"thread_{uuid.uuid4().hex[:16]}"
-                logger.warning(f"No thread_id provided — generated new: {thread_id}")
-
-            conversation_id = None
-            try:
-                conv_query = "SELECT conversation_id FROM conversations WHERE thread_id = :thread_id"
-                dbg("Looking up conversation by thread_id", {"thread_id": thread_id, "sql": conv_query})
-                conv_result = await db.fetch_one(query=conv_query, values={"thread_id": thread_id})
-                logger.debug(f"DB result for conversation lookup: {conv_result}")
-                if conv_result:
-                    conversation_id = conv_result["conversation_id"]
-                    logger.info(f"Found conversation_id={conversation_id} for thread_id={thread_id}")
-                else:
-                    logger.warning(f"No conversation found for thread_id={thread_id} — will attempt auto-create if user provided")
-                    if user_id:
-                        try:
-                            logger.info(f"Auto-creating conversation for user_id={user_id}, thread_id={thread_id}")
-                            recheck_query = "SELECT conversation_id FROM conversations WHERE thread_id = :thread_id"
-                            recheck_result = await db.fetch_one(query=recheck_query, values={"thread_id": thread_id})
-                            logger.debug(f"Recheck result: {recheck_result}")
-                            if recheck_result:
-                                conversation_id = recheck_result["conversation_id"]
-                                logger.info(f"Conversation already created by race condition: {conversation_id}")
-                            else:
-                                insert_query = """
-                                INSERT INTO conversations (user_id, title, thread_id)
-                                VALUES (:user_id, :title, :thread_id)
-                                ON CONFLICT (thread_id) DO UPDATE SET thread_id = conversations.thread_id
-                                RETURNING conversation_id
-                                """
-                                dbg("Inserting new conversation", {"user_id": int(user_id), "thread_id": thread_id})
-                                result = await db.fetch_one(
-                                    query=insert_query,
-                                    values={
-                                        "user_id": int(user_id),
-                                        "title": "New Conversation",
-                                        "thread_id": thread_id
-                                    }
-                                )
-                                logger.debug(f"Insert result: {result}")
-                                if result:
-                                    conversation_id = result["conversation_id"]
-                                    logger.info(f"Auto-created conversation_id={conversation_id}")
-                                else:
-                                    logger.error("Insert returned no result")
-                        except Exception as create_err:
-                            logger.exception(f"Failed auto-create: {create_err}")
-                    else:
-                        logger.warning("Cannot auto-create conversation — no user_id provided")
-            except Exception as e:
-                logger.exception(f"Error while looking up / creating conversation: {e}")
+            # Resolve user_id / thread_id once per request
+            if request is not None:
+                ctx = await user_context(request)
+            else:
+                ctx = UserCtx(user_id=None, thread_id=f"thread_{uuid.uuid4().hex[:16]}")
+            user_id, thread_id = ctx.user_id, ctx.thread_id
+            logger.debug("User context: user_id=%s thread_id=%s", user_id, thread_id)
 
-            logger.info(f"Resolved: user_id={user_id}, thread_id={thread_id}, conversation_id={conversation_id}")
+            conversation_id = await resolve_conversation_id(user_id, thread_id)
+            logger.info("Resolved: user_id=%s thread_id=%s conversation_id=%s", user_id, thread_id, conversation_id)
 
             # Ensure state
             if "state" not in data:
@@ -156,18 +73,15 @@ class UserAwareLangGraphAgent(LangGraphAgent):
                 logger.debug("Injected missing data['state']")
 
             if user_id:
-                try:
-                    data["state"]["user_id"] = int(user_id)
-                except Exception:
-                    data["state"]["user_id"] = user_id
-                logger.debug(f"Injected user_id into state: {data['state']['user_id']}")
+                data["state"]["user_id"] = user_id
+                logger.debug("Injected user_id into state: %s", data["state"]["user_id"])
 
             if conversation_id:
                 data["state"]["conversation_id"] = conversation_id
-                logger.debug(f"Injected conversation_id into state: {conversation_id}")
+                logger.debug("Injected conversation_id into state: %s", conversation_id)
 
             if "user_data" in data.get("state", {}):
-                logger.info("Frontend user_data present in state — preserving")
+                logger.debug("Frontend user_data present in state — preserving")
 
             # ============================================================
             # SAVE USER MESSAGE TO DATABASE (before agent execution)
@@ -179,41 +93,38 @@ class UserAwareLangGraphAgent(LangGraphAgent):
                     new_messages = data.get("messages", [])
 
                     if new_messages:
-                        logger.info(f"Found {len(new_messages)} new message(s) to persist")
+                        logger.debug("Found %s new message(s) to persist", len(new_messages))
 
-                        # Save each new user message
+                        # Collect new user messages and save them in one statement
+                        # (assistant messages come after agent response)
+                        user_rows = []
                         for msg in new_messages:
-                            # Only save user messages here (assistant messages come after agent response)
-                            msg_type = message_type_to_role(msg)
-                            if msg_type == "user":
-                                extracted = extract_message_content(msg)
-
-                                # Safety check — avoid saving empty message
-                                if not extracted.get("text"):
-                                    logger.warning(
-                                        "User message has no text after extraction — skipping save",
-                                        extra={"raw_message": str(msg)}
-                                    )
-                                else:
-                                    logger.info(
-                                        f"Saving user message to conversation {conversation_id}",
-                                        extra={"content": extracted}
-                                    )
-                                    await save_message_to_db(
-                                        conversation_id=conversation_id,
-                                        role="user",
-                                        content=extracted
-                                    )
+                            if message_type_to_role(msg) != "user":
+                                continue
+                            extracted = extract_message_content(msg)
+
+                            # Safety check — avoid saving empty message
+                            if not extracted or not extracted.get("text"):
+                                logger.warning(
+                                    "User message has no text after extraction — skipping save",
+                                    extra={"raw_message": str(msg)}
+                                )
+                            else:
+                                user_rows.append(("user", extracted))
+
+                        if user_rows:
+                            logger.debug("Queueing %s user message(s) for conversation %s", len(user_rows), conversation_id)
+                            message_writer.enqueue(conversation_id, user_rows)
                     else:
                         logger.debug("No new messages in data['messages']")
 
                 except Exception as persist_err:
-                    logger.exception(f"Error saving user message: {persist_err}")
+                    logger.exception("Error saving user message: %s", persist_err)
                     # Don't fail the request if persistence fails
             else:
                 logger.warning("No conversation_id — skipping message persistence")
 
-            dbg("UserAwareLangGraphAgent.invoke() — CALLING super().invoke()", {"state_snapshot": data.get("state")})
+            logger.debug("UserAwareLangGraphAgent.invoke() — CALLING super().invoke(): state=%s", data.get("state"))
             result = await super().invoke(data, request)
 
             # ============================================================
@@ -233,48 +144,57 @@ class UserAwareLangGraphAgent(LangGraphAgent):
                             result_messages = result["state"]["messages"]
 
                     if result_messages:
-                        logger.info(f"Found {len(result_messages)} message(s) in agent response")
-
-                        # Save assistant and tool messages (skip user messages as they're already saved)
-                        for msg in result_messages:
-                            msg_type = message_type_to_role(msg)
-                            if msg_type in ["assistant", "tool"]:
-                                extracted = extract_message_content(msg)
-
-                                if extracted.get("text") or extracted.get("tool_calls"):
-                                    await save_message_to_db(
-                                        conversation_id=conversation_id,
-                                        role=msg_type,
-                                        content=extracted
-                                    )
-
-                                logger.info(f"Saving {msg_type} message to conversation {conversation_id}")
-                                await save_langchain_message(conversation_id, msg)
+                        logger.debug("Found %s message(s) in agent response", len(result_messages))
+
+                        # Queue assistant and tool messages for the background
+                        # writer (skip user messages as they're already queued)
+                        message_writer.enqueue(
+                            conversation_id,
+                            to_message_rows(result_messages, roles=("assistant", "tool"))
+                        )
                     else:
                         logger.debug("No messages found in agent result to persist")
 
                 except Exception as persist_err:
-                    logger.exception(f"Error saving assistant message: {persist_err}")
+                    logger.exception("Error saving assistant message: %s", persist_err)
                     # Don't fail the request if persistence fails
 
             return result
-        except Exception as e:
+        except Exception:
             logger.error("Unhandled exception in UserAwareLangGraphAgent.invoke()")
             logger.error(traceback.format_exc())
             # Return a structured error to the caller so frontend sees a 500 instead of crashing silently
             raise
 
-def load_and_index_all_pdfs(folder_path: str):
+def _corpus_fingerprint(folder_path: str, pdf_files: list) -> str:
+    """
+    Hash the PDF set (name, size, mtime), the chunking settings, the
+    embedding model, the PDF text extractor and the vector index type.
+
+    A saved index is only reused when this matches, so any added, removed
+    or edited PDF triggers a rebuild.
+    """
+    h = hashlib.sha256()
+    h.update(f"chunks={CHUNK_SIZE}/{CHUNK_OVERLAP}|emb={embeddings_id()}|loader={PDF_LOADER_ID}|index={VECTOR_INDEX_ID}".encode())
+    for name in sorted(pdf_files):
+        st = os.stat(os.path.join(folder_path, name))
+        h.update(f"|{name}|{st.st_size}|{st.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+async def load_and_index_all_pdfs(folder_path: str):
     """
     Load ALL PDFs in a folder, split them into chunks, 
     embed them, and create ONE combined vector store.
 
+    The embedded store is saved to INDEX_DIR and loaded from there on the
+    next boot if the PDFs have not changed, skipping parsing and embedding.
+
     Returns:
         retriever: unified retriever that searches across all PDFs
     """
 
-    print("=== START: load_and_index_all_pdfs ===")
-    print(f"[1] Scanning folder for PDFs: {folder_path}")
+    logger.debug("Scanning folder for PDFs: %s", folder_path)
 
     # 1. Collect all PDF filenames
     pdf_files = [
@@ -282,60 +202,99 @@ def load_and_index_all_pdfs(folder_path: str):
         if f.lower().endswith(".pdf")
     ]
 
-    print(f"[2] Found {len(pdf_files)} PDF files:")
-    for f in pdf_files:
-        print(f"     - {f}")
+    logger.info("Found %s PDF files: %s", len(pdf_files), pdf_files)
 
-    all_documents = []
+    embeddings = create_embeddings()
 
-    # 2. Process each PDF file
-    for idx, pdf_name in enumerate(pdf_files, start=1):
-        pdf_path = os.path.join(folder_path, pdf_name)
-        print(f"\n=== Processing PDF {idx}/{len(pdf_files)} ===")
-        print(f"[3] Loading PDF: {pdf_path}")
-
-        loader = PyPDFLoader(pdf_path)
-        docs = loader.load()
-        print(f"[4] Loaded {len(docs)} pages from: {pdf_name}")
-
-        # Split into chunks
-        print("[5] Splitting PDF into chunks...")
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-        )
-        chunks = splitter.split_documents(docs)
-        print(f"[6] Created {len(chunks)} chunks from: {pdf_name}")
-
-        # Add metadata to identify origin file (optional but recommended)
-        for c in chunks:
-            c.metadata["source_pdf"] = pdf_name
+    # Reuse the saved index when the corpus is unchanged
+    fingerprint = await asyncio.to_thread(_corpus_fingerprint, folder_path, pdf_files)
+    fingerprint_path = os.path.join(INDEX_DIR, "fingerprint")
+    try:
+        with open(fingerprint_path) as f:
+            saved_fingerprint = f.read().strip()
+    except OSError:
+        saved_fingerprint = None
 
+    if saved_fingerprint == fingerprint:
+        try:
+            vectorstore = await asyncio.to_thread(load_vectorstore, INDEX_DIR, embeddings)
+            logger.info("Loaded saved index from %s (PDFs unchanged)", INDEX_DIR)
+            return vectorstore.as_retriever(search_kwargs={"k": TOP_K_CHUNKS})
+        except Exception:
+            logger.exception("Failed to load saved index — rebuilding")
+
+    # 2. Parse and split the PDFs in parallel (CPU-bound, independent per file)
+    logger.info("Loading and splitting %s PDFs in parallel...", len(pdf_files))
+    loop = asyncio.get_running_loop()
+    workers = max(1, min(len(pdf_files), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks_per_pdf = await asyncio.gather(*[
+            loop.run_in_executor(pool, load_and_split_pdf, folder_path, pdf_name)
+            for pdf_name in pdf_files
+        ])
+
+    all_documents = []
+    for pdf_name, chunks in zip(pdf_files, chunks_per_pdf):
+        logger.debug("%s: %s chunks", pdf_name, len(chunks))
         all_documents.extend(chunks)
 
-    print(f"\n[7] TOTAL chunks from ALL PDFs: {len(all_documents)}")
+    logger.info("Total chunks from all PDFs: %s", len(all_documents))
 
-    # 3. Build embeddings + vector store
-    print("[8] Initializing OpenAI embeddings...")
-    embeddings = OpenAIEmbeddings()
+    # 3. Embed the chunks in concurrent batches + build the vector store
+    texts = [d.page_content for d in all_documents]
+    batches = [
+        texts[i:i + EMBEDDING_BATCH_SIZE]
+        for i in range(0, len(texts), EMBEDDING_BATCH_SIZE)
+    ]
+    logger.info("Embedding %s chunks in %s batch(es)...", len(texts), len(batches))
+
+    semaphore = asyncio.Semaphore(EMBEDDING_CONCURRENCY)
+
+    async def embed_batch(batch):
+        async with semaphore:
+            return await embeddings.aembed_documents(batch)
+
+    vectors = [v for batch in await asyncio.gather(*map(embed_batch, batches)) for v in batch]
 
-    print("[9] Creating combined vector store...")
-    vectorstore = DocArrayInMemorySearch.from_documents(
-        documents=all_documents,
-        embedding=embeddings
+    # Index training and graph construction are CPU-bound
+    vectorstore = await asyncio.to_thread(
+        build_vectorstore,
+        texts,
+        vectors,
+        embeddings,
+        [d.metadata for d in all_documents],
     )
-    print("[10] Combined vector store created successfully.")
 
-    # 4. Make retriever
-    print("[11] Creating unified retriever (k=3)...")
-    retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+    # Save for the next boot; the fingerprint is written last so a partial
+    # save is never mistaken for a valid index
+    try:
+        if os.path.exists(fingerprint_path):
+            os.remove(fingerprint_path)
+        await asyncio.to_thread(vectorstore.save_local, INDEX_DIR)
+        with open(fingerprint_path, "w") as f:
+            f.write(fingerprint)
+        logger.info("Saved index to %s", INDEX_DIR)
+    except Exception:
+        logger.exception("Failed to save index — it will be rebuilt on next boot")
 
-    print("[12] Unified retriever ready.")
-    print("=== END: load_and_index_all_pdfs ===\n")
+    # 4. Make retriever
+    retriever = vectorstore.as_retriever(search_kwargs={"k": TOP_K_CHUNKS})
+    logger.debug("Unified retriever ready (k=%s)", TOP_K_CHUNKS)
 
     return retriever
 
+async def warm_up(retriever):
+    """
+    Run one throwaway retrieval so the first user request does not pay for
+    the embeddings client's TLS handshake or for paging in the index.
+    """
+    try:
+        await asyncio.wait_for(asyncio.to_thread(retriever.invoke, "annual leave policy"), timeout=15)
+        logger.info("Retriever warmed up")
+    except Exception:
+        logger.warning("Retriever warm-up failed — first request will be slower", exc_info=True)
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
@@ -344,29 +303,50 @@ async def lifespan(app: FastAPI):
     """
     
     # Startup
-    # Validate OpenAI API key
-    if not os.getenv("OPENAI_API_KEY"):
-        raise ValueError(
-            "OPENAI_API_KEY not found in environment variables. "
-            "Please set it in a .env file or export it."
-        )
+    config.validate_environment()
     
-    try:
-        await db.connect()
-        logger.info("✅ Connected to PostgreSQL")
-    except Exception:
-        logger.exception("❌ Failed to connect to Postgres")
-        raise
+    async def connect_db():
+        try:
+            await asyncio.gather(db.connect(), connect_raw_pool())
+            logger.info("✅ Connected to PostgreSQL")
+        except Exception:
+            logger.exception("❌ Failed to connect to Postgres")
+            raise
 
     logger.info("\n" + "=" * 60)
     logger.info("Starting GIU Admin Policy QA Agent API")
     logger.info("=" * 60 + "\n")
 
-    # Load and index the PDF
-    retriever = load_and_index_all_pdfs(folder_path)
+    # Connecting to Postgres and loading/indexing the PDFs are independent,
+    # so they overlap. The index and agent graph are built exactly once per
+    # process; every request (CopilotKit and /chat/stream) reuses them.
+    _, retriever = await asyncio.gather(connect_db(), load_and_index_all_pdfs(folder_path))
+    app.state.retriever = retriever
+
+    # Message persistence runs off the request path from here on
+    message_writer.start()
+
+    # Optional: create tables (dev convenience, RUN_DDL=1). Production boots
+    # skip the DDL round-trips and manage the schema separately.
+    if os.getenv("RUN_DDL") == "1":
+        try:
+            logger.info("Ensuring database tables exist (Base.metadata.create_all)...")
+            await asyncio.to_thread(Base.metadata.create_all, bind=engine)
+            logger.info("Database tables checked/created.")
+        except Exception:
+            logger.exception("Failed to create/check DB tables with Base.metadata.create_all")
+
+    # Always: indexes that existing databases need (message dedup relies on
+    # the unique copilot_message_id index); a no-op once applied
+    try:
+        await apply_migrations()
+    except Exception:
+        logger.exception("Failed to apply index migrations")
 
-    # Create the agent graph
     graph = create_agent_graph(retriever)
+    app.state.graph = graph
+
+    await warm_up(retriever)
 
     # Create CopilotKit Remote Endpoint with our LangGraph agent
     sdk = CopilotKitRemoteEndpoint(
@@ -387,8 +367,11 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    # Let pending background writes finish before the pool closes
+    await message_writer.stop()
+
     try:
-        await db.disconnect()
+        await asyncio.gather(db.disconnect(), close_raw_pool())
         logger.info("🛑 Disconnected Postgres")
     except Exception:
         logger.exception("❌ Error disconnecting Postgres")
@@ -410,14 +393,6 @@ app = FastAPI(
 # Mount API routers (this was missing)
 app.include_router(router)
 
-# Optional: create tables (dev convenience)
-try:
-    logger.info("Ensuring database tables exist (Base.metadata.create_all)...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database tables checked/created.")
-except Exception:
-    logger.exception("Failed to create/check DB tables with Base.metadata.create_all")
-
 
 # Configure CORS for frontend access
 app.add_middleware(
@@ -437,9 +412,13 @@ app.add_middleware(
 
 # Health check endpoint
 @app.get("/health")
-def health_check():
+def health_check(request: Request):
     """Health check endpoint."""
-    return {"status": "ok", "agent": "policy_qa_agent"}
+    return {
+        "status": "ok",
+        "agent": "policy_qa_agent",
+        "agent_ready": getattr(request.app.state, "graph", None) is not None,
+    }
 
 
 def main():
@@ -1,7 +1,13 @@
 # backend/scripts/seed_db.py
 
+import csv
+import io
+import os
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from database.db_connection import engine, Base
@@ -16,13 +22,162 @@ from database.models_postgres import (
 # Helpers
 # -------------------------------------------------
 
+# Seed accounts are dev fixtures, so hash them cheaply by default (cost 4 vs
+# bcrypt's 12). Login verification reads the cost from the hash itself.
+BCRYPT_COST = int(os.getenv("BCRYPT_COST", "4"))
+
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=BCRYPT_COST)).decode()
+
+def hash_passwords(passwords: list[str]) -> list[str]:
+    """
+    Hash many passwords in parallel. bcrypt's C code releases the GIL, so
+    threads hash on all cores without process start-up cost.
+    """
+    if len(passwords) <= 1:
+        return [hash_password(p) for p in passwords]
+    with ThreadPoolExecutor(max_workers=min(len(passwords), os.cpu_count() or 1)) as pool:
+        return list(pool.map(hash_password, passwords))
+
+
+TRAINING_COPY_COLUMNS = ("user_id", "training_title", "provider", "completion_date", "certificate_url")
+
+def copy_training_records(session: Session, rows: list[dict]):
+    """
+    Bulk-load training records with COPY FROM STDIN (one round-trip for any
+    number of rows), inside the session's transaction. Missing/None values
+    are written as empty CSV fields, which COPY reads as NULL.
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for row in rows:
+        writer.writerow(["" if row.get(c) is None else row[c] for c in TRAINING_COPY_COLUMNS])
+    buf.seek(0)
+
+    cursor = session.connection().connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY {TrainingRecord.__tablename__} ({', '.join(TRAINING_COPY_COLUMNS)}) "
+            "FROM STDIN WITH (FORMAT CSV)",
+            buf,
+        )
+    finally:
+        cursor.close()
 
-def user_exists(session: Session, email: str, employee_id: str) -> bool:
-    return session.query(User).filter(
-        (User.email == email) | (User.employee_id == employee_id)
-    ).first() is not None
+# -------------------------------------------------
+# Seed Data
+# -------------------------------------------------
+# Each entry: User columns (password in plain text, hashed on insert) plus
+# optional "academic_profile" / "leave_balance" rows and a "training_records"
+# list for that user.
+
+SEED_USERS = [
+    # =================================================
+    # USER 1 — Academic (Lecturer)
+    # =================================================
+    # {
+    #     "employee_id": "GIU-AC-001",
+    #     "full_name": "Dr. Caroline Sabty",
+    #     "role_type": "academic",
+    #     "faculty_or_department": "Informatics and Computer Science",
+    #     "position_title": "Lecturer",
+    #     "contract_type": "full-time",
+    #     "hire_date": datetime(2018, 9, 1),
+    #     "date_of_birth": datetime(1985, 6, 12),
+    #     "service_years": 6,
+    #     "social_insurance_years": 6,
+    #     "probation_period": False,
+    #     "is_active": True,
+    #     "is_admin": False,
+    #     "email": "caroline.sabty@giu-uni.de",
+    #     "password": "112233",
+    #     "academic_profile": {
+    #         "phd_awarded_year": 2017,
+    #         "last_promotion_year": 2019,
+    #         "publications_count": 8,
+    #         "single_authored_publications": 2,
+    #         "h_index": 6,
+    #         "supervised_phd_students": 1,
+    #         "supervised_masters_students": 3,
+    #         "research_funding_usd": 150000,
+    #         "workshops_organized": 2,
+    #         "awards_count": 1,
+    #         "promotion_eligibility_score": 17.5,
+    #         "eligible_for_promotion": False,
+    #     },
+    #     "leave_balance": {
+    #         "annual_entitlement": 21,
+    #         "annual_taken": 10,
+    #         "accidental_entitlement": 6,
+    #         "accidental_taken": 1,
+    #         "sick_entitlement": 180,
+    #         "sick_taken": 5,
+    #         "marriage_leave_entitlement": 10,
+    #         "marriage_leave_taken": 0,
+    #     },
+    # },
+
+    # =================================================
+    # USER 2 — Academic (Associate Professor)
+    # =================================================
+    {
+        "employee_id": "8113",
+        "full_name": "Dr. Yassmeen",
+        "role_type": "Administrative",
+        "faculty_or_department": "Academic performance",
+        "position_title": "Senior academic co-ordinator",
+        "contract_type": "full-time",
+        "hire_date": datetime(2021, 1, 8),
+        "date_of_birth": datetime(1997, 3, 18),
+        "service_years": 5,
+        "social_insurance_years": 5,
+        "probation_period": False,
+        "is_active": True,
+        "is_admin": True,
+        "email": "yasmeen.hamdy@giu-uni.de",
+        "password": "112233",
+        "leave_balance": {
+            "annual_entitlement": 21,
+            "annual_taken": 21,
+            "accidental_entitlement": 6,
+            "accidental_taken": 6,
+            "sick_entitlement": 180,
+            "sick_taken": 0,
+        },
+    },
+
+    # =================================================
+    # USER 3 — Administrative Staff
+    # =================================================
+    # {
+    #     "employee_id": "GIU-AD-001",
+    #     "full_name": "Mona Ali",
+    #     "role_type": "administrative",
+    #     "faculty_or_department": "Human Resources",
+    #     "position_title": "HR Officer",
+    #     "contract_type": "full-time",
+    #     "hire_date": datetime(2020, 7, 1),
+    #     "date_of_birth": datetime(1990, 9, 5),
+    #     "service_years": 4,
+    #     "social_insurance_years": 4,
+    #     "probation_period": False,
+    #     "is_active": True,
+    #     "is_admin": True,
+    #     "email": "mona.ali@giu.edu.eg",
+    #     "password": "Password123!",
+    #     "leave_balance": {
+    #         "annual_entitlement": 21,
+    #         "annual_taken": 6,
+    #         "accidental_entitlement": 6,
+    #         "accidental_taken": 2,
+    #         "sick_entitlement": 180,
+    #         "sick_taken": 1,
+    #     },
+    # },
+]
+
+# Per-user keys that hold dependent rows, not User columns
+CHILD_KEYS = ("academic_profile", "leave_balance", "training_records")
 
 # -------------------------------------------------
 # Seed Function
@@ -35,136 +190,51 @@ def seed_database():
 
     with Session(engine) as session:
 
-        # =================================================
-        # USER 1 — Academic (Lecturer)
-        # =================================================
-        # if not user_exists(session, "caroline.sabty@giu-uni.de", "GIU-AC-001"):
-        #     user1 = User(
-        #         employee_id="GIU-AC-001",
-        #         full_name="Dr. Caroline Sabty",
-        #         role_type="academic",
-        #         faculty_or_department="Informatics and Computer Science",
-        #         position_title="Lecturer",
-        #         contract_type="full-time",
-        #         hire_date=datetime(2018, 9, 1),
-        #         date_of_birth=datetime(1985, 6, 12),
-        #         service_years=6,
-        #         social_insurance_years=6,
-        #         probation_period=False,
-        #         is_active=True,
-        #         is_admin=False,
-        #         email="caroline.sabty@giu-uni.de",
-        #         password=hash_password("112233")
-        #     )
-
-        #     session.add(user1)
-        #     session.flush()  # get user_id
-
-        #     session.add(AcademicProfile(
-        #         user_id=user1.user_id,
-        #         phd_awarded_year=2017,
-        #         last_promotion_year=2019,
-        #         publications_count=8,
-        #         single_authored_publications=2,
-        #         h_index=6,
-        #         supervised_phd_students=1,
-        #         supervised_masters_students=3,
-        #         research_funding_usd=150000,
-        #         workshops_organized=2,
-        #         awards_count=1,
-        #         promotion_eligibility_score=17.5,
-        #         eligible_for_promotion=False
-        #     ))
-
-        #     session.add(LeaveBalance(
-        #         user_id=user1.user_id,
-        #         annual_entitlement=21,
-        #         annual_taken=10,
-        #         accidental_entitlement=6,
-        #         accidental_taken=1,
-        #         sick_entitlement=180,
-        #         sick_taken=5,
-        #         marriage_leave_entitlement=10,
-        #         marriage_leave_taken=0
-        #     ))
-
-        #     print("✅ Seeded academic user: Dr Caroline")
-
-        # =================================================
-        # USER 2 — Academic (Associate Professor)
-        # =================================================
-        if not user_exists(session, "yasmeen.hamdy@giu-uni.de", "8113"):
-            user2 = User(
-                employee_id="8113",
-                full_name="Dr. Yassmeen",
-                role_type="Administrative",
-                faculty_or_department="Academic performance",
-                position_title="Senior academic co-ordinator",
-                contract_type="full-time",
-                hire_date=datetime(2021, 1, 8),
-                date_of_birth=datetime(1997, 3, 18),
-                service_years=5,
-                social_insurance_years=5,
-                probation_period=False,
-                is_active=True,
-                is_admin=True,
-                email="yasmeen.hamdy@giu-uni.de",
-                password=hash_password("112233")
-            )
-
-            session.add(user2)
-            session.flush()
-
-            
-
-            session.add(LeaveBalance(
-                user_id=user2.user_id,
-                annual_entitlement=21,
-                annual_taken=21,
-                accidental_entitlement=6,
-                accidental_taken=6,
-                sick_entitlement=180,
-                sick_taken=0
-            ))
-
-            print("✅ Seeded academic admin: yasmeen.hamdy")
-
-        # =================================================
-        # USER 3 — Administrative Staff
-        # =================================================
-        # if not user_exists(session, "mona.ali@giu.edu.eg", "GIU-AD-001"):
-        #     user3 = User(
-        #         employee_id="GIU-AD-001",
-        #         full_name="Mona Ali",
-        #         role_type="administrative",
-        #         faculty_or_department="Human Resources",
-        #         position_title="HR Officer",
-        #         contract_type="full-time",
-        #         hire_date=datetime(2020, 7, 1),
-        #         date_of_birth=datetime(1990, 9, 5),
-        #         service_years=4,
-        #         social_insurance_years=4,
-        #         probation_period=False,
-        #         is_active=True,
-        #         is_admin=True,
-        #         email="mona.ali@giu.edu.eg",
-        #         password=hash_password("Password123!")
-        #     )
-
-        #     session.add(user3)
-        #     session.flush()
-
-        #     session.add(LeaveBalance(
-        #         user_id=user3.user_id,
-        #         annual_entitlement=21,
-        #         annual_taken=6,
-        #         accidental_entitlement=6,
-        #         accidental_taken=2,
-        #         sick_entitlement=180,
-        #         sick_taken=1
-        #     ))
-
-            # print("✅ Seeded administrative user: Mona Ali")
+        # Users in one multi-row INSERT; rows that clash with an existing
+        # employee_id or email (both unique) are skipped by Postgres itself,
+        # and only the inserted ones come back
+        hashes = hash_passwords([u["password"] for u in SEED_USERS])
+        user_rows = [
+            {
+                **{k: v for k, v in u.items() if k not in CHILD_KEYS},
+                "password": hashed,
+            }
+            for u, hashed in zip(SEED_USERS, hashes)
+        ]
+        inserted = session.execute(
+            pg_insert(User)
+            .values(user_rows)
+            .on_conflict_do_nothing()
+            .returning(User.user_id, User.employee_id)
+        ).all() if user_rows else []
+        user_ids = {row.employee_id: row.user_id for row in inserted}
+        new_users = [u for u in SEED_USERS if u["employee_id"] in user_ids]
+
+        if new_users:
+            # Dependent rows in one INSERT per table
+            academic_rows = [
+                {"user_id": user_ids[u["employee_id"]], **u["academic_profile"]}
+                for u in new_users if "academic_profile" in u
+            ]
+            leave_rows = [
+                {"user_id": user_ids[u["employee_id"]], **u["leave_balance"]}
+                for u in new_users if "leave_balance" in u
+            ]
+            if academic_rows:
+                session.execute(insert(AcademicProfile), academic_rows)
+            if leave_rows:
+                session.execute(insert(LeaveBalance), leave_rows)
+
+            # Training history is the table that grows per user: COPY it
+            training_rows = [
+                {"user_id": user_ids[u["employee_id"]], **t}
+                for u in new_users for t in u.get("training_records", ())
+            ]
+            if training_rows:
+                copy_training_records(session, training_rows)
+
+            for u in new_users:
+                print(f"✅ Seeded user: {u['full_name']} ({u['email']})")
 
         # =================================================
         session.commit()
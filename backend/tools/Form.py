@@ -10,12 +10,46 @@ from utils.form_convertor import (
     FILLED_FORMS_DIR
 )
 
-from pydantic import ValidationError
+from pydantic import BaseModel, ValidationError
 from pathlib import Path
 from typing import Optional
+from functools import lru_cache
+from collections import OrderedDict
+from datetime import date
+import copy
+import hashlib
+import threading
 import uuid
 
 
+SUPPORTED_FORM_TYPES = frozenset({"annual", "accidental", "marriage"})
+
+
+@lru_cache(maxsize=4)
+def _extractor(schema: type[BaseModel]):
+    """
+    Structured-output extractor for `schema`, built once and reused.
+
+    Created on first use (not at import) so importing the tools does not
+    require OPENAI_API_KEY.
+    """
+    return ChatOpenAI(model="gpt-5-mini", temperature=0).with_structured_output(schema)
+
+
+# (form_type, day, text digest) -> parsed fields. The day is part of the key
+# because requests like "leave from tomorrow" resolve to different dates.
+_PARSE_CACHE_MAX_ENTRIES = 512
+_parse_cache: "OrderedDict[tuple, dict]" = OrderedDict()
+# Sync tools run in worker threads, so concurrent calls share the cache
+_parse_cache_lock = threading.Lock()
+
+
+def _parse_cache_key(form_type: str, user_text: str) -> tuple:
+    normalized = " ".join(user_text.lower().split())
+    digest = hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+    return form_type, date.today().isoformat(), digest
+
+
 # ======================================================
 # PARSER TOOL
 # ======================================================
@@ -26,19 +60,28 @@ def parse_form_request_excel(user_text: str, form_type: str):
     Parse natural-language text into structured fields for Excel HR forms.
     """
     # Only annual/marriage/accidental supported for now
-    if form_type not in ["annual", "accidental", "marriage"]:
+    if form_type not in SUPPORTED_FORM_TYPES:
         return {
             "error": "unsupported_form",
-            "supported": ["annual", "accidental", "marriage"]
+            "supported": sorted(SUPPORTED_FORM_TYPES)
         }
 
-    extractor = ChatOpenAI(
-        model="gpt-5-mini", temperature=0
-    ).with_structured_output(AnnualLeaveRequest)
+    key = _parse_cache_key(form_type, user_text)
+    with _parse_cache_lock:
+        cached = _parse_cache.get(key)
+        if cached is not None:
+            _parse_cache.move_to_end(key)
+    if cached is not None:
+        # Deep copy: callers may mutate nested values of the result
+        return {"success": True, "parsed": copy.deepcopy(cached)}
 
     try:
-        parsed = extractor.invoke(user_text)
-        return {"success": True, "parsed": parsed.dict()}
+        parsed = _extractor(AnnualLeaveRequest).invoke(user_text).model_dump()
+        with _parse_cache_lock:
+            _parse_cache[key] = copy.deepcopy(parsed)
+            if len(_parse_cache) > _PARSE_CACHE_MAX_ENTRIES:
+                _parse_cache.popitem(last=False)
+        return {"success": True, "parsed": parsed}
     except Exception as e:
         return {"error": "PARSE_FAILED", "detail": str(e)}
 
@@ -55,14 +98,14 @@ def fill_excel_form(form_type: str, parsed_data: dict, user_id: Optional[int] =
     Returns {file_path}.
     """
     try:
-        validated = AnnualLeaveRequest(**parsed_data)
+        validated = AnnualLeaveRequest.model_validate(parsed_data)
     except ValidationError as e:
         return {"error": "VALIDATION_FAILED", "detail": e.errors()}
 
-    # Call your new converter function
+    # Validated once here; the converter takes the model as-is
     result = converter_fill_excel_form(
         form_type=form_type,
-        parsed_data=validated.dict(),
+        data=validated,
         user_id=user_id or 0
     )
 
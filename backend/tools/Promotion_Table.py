@@ -1,11 +1,16 @@
 from langchain.tools import tool
-from utils.promotion_table import PROMOTION_TABLE_LECTURER_TO_AP
+from utils.promotion_table import PROMOTION_TABLE_JSON
+
+
+# Tool results become ToolMessage text, so the pre-encoded table is handed
+# over as a string and never re-serialized
+_PROMOTION_TABLE_TEXT = PROMOTION_TABLE_JSON.decode()
 
 
 @tool("get_promotion_calculation_table")
-def get_promotion_calculation_table() -> dict:
+def get_promotion_calculation_table() -> str:
     """
     Returns the official GIU promotion calculation table for Lecturer → Associate Professor.
     Use this tool when the user asks about promotion criteria, requirements, or how promotion is evaluated.
     """
-    return PROMOTION_TABLE_LECTURER_TO_AP
+    return _PROMOTION_TABLE_TEXT
@@ -0,0 +1,32 @@
+"""
+Embeddings
+Single place that picks the embedding model, so the policy index and the
+query-time vectors always come from the same model.
+"""
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from config import EMBEDDING_PROVIDER, LOCAL_EMBEDDING_MODEL, EMBEDDING_BATCH_SIZE
+
+
+def create_embeddings() -> Embeddings:
+    """
+    Return the configured embedding model.
+
+    "fastembed" runs LOCAL_EMBEDDING_MODEL on the CPU (needs the optional
+    `fastembed` package); anything else uses the OpenAI embeddings API.
+    """
+    if EMBEDDING_PROVIDER == "fastembed":
+        from langchain_community.embeddings import FastEmbedEmbeddings
+
+        return FastEmbedEmbeddings(model_name=LOCAL_EMBEDDING_MODEL)
+
+    return OpenAIEmbeddings(chunk_size=EMBEDDING_BATCH_SIZE, max_retries=5)
+
+
+def embeddings_id() -> str:
+    """Identify the embedding model (part of the saved index fingerprint)."""
+    if EMBEDDING_PROVIDER == "fastembed":
+        return f"fastembed:{LOCAL_EMBEDDING_MODEL}"
+    return "openai"
@@ -8,6 +8,8 @@ Generates filled Excel files into /filled_forms (outside backend)
 import datetime
 import shutil
 import tempfile
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
 from typing import Optional
 import subprocess
@@ -135,10 +137,61 @@ FORM_TEMPLATES = {
 }
 
 
+# ====================================================================
+# CELL LAYOUT — Annual_Leave_Request.xlsx
+# ====================================================================
+
+NAME_CELL = (9, 3)
+EMPLOYEE_ID_CELL = (14, 2)
+
+# Leave type → checkbox cell (row, col, label)
+LEAVE_TYPE_CELLS = {
+    LeaveType.ANNUAL: (5, 1, "☑ Annual"),
+    LeaveType.ACCIDENTAL: (5, 4, "☑ Accidental"),
+    LeaveType.MARRIAGE: (5, 9, "☑ Marriage"),
+    LeaveType.OTHER: (5, 14, "☑ Other: "),
+}
+
+# (staff category, employment type) → (row, col) of the employment checkbox
+EMPLOYMENT_CELLS = {
+    (StaffCategory.ACADEMIC, EmploymentType.FULL_TIME): (17, 1),
+    (StaffCategory.ACADEMIC, EmploymentType.PART_TIME): (17, 5),
+    (StaffCategory.NON_ACADEMIC, EmploymentType.FULL_TIME): (17, 10),
+    (StaffCategory.NON_ACADEMIC, EmploymentType.PART_TIME): (17, 15),
+}
+EMPLOYMENT_LABELS = {
+    EmploymentType.FULL_TIME: "☑ Full time",
+    EmploymentType.PART_TIME: "☑ Part time",
+}
+
+DEPARTMENT_CELLS = {
+    StaffCategory.ACADEMIC: (18, 1),
+    StaffCategory.NON_ACADEMIC: (18, 10),
+}
+
+LEAVE_FROM_CELL = (19, 1)
+LEAVE_TO_CELL = (19, 10)
+TOTAL_DAYS_CELL = (20, 4)
+
+
 # ====================================================================
 # HELPERS
 # ====================================================================
 
+@lru_cache(maxsize=8)
+def _template_bytes(template_path: str, mtime_ns: int) -> bytes:
+    """
+    Template file contents, read from disk once per template version
+    (mtime is part of the key, so an edited template is picked up).
+
+    Old .xls templates are converted here, so LibreOffice runs once per
+    template version instead of on every fill.
+    """
+    if template_path.endswith(".xls"):
+        template_path = convert_xls_to_xlsx(template_path)
+    return Path(template_path).read_bytes()
+
+
 def format_date(d: Optional[datetime.date]) -> str:
     return "" if d is None else d.strftime("%d/%m/%Y")
 
@@ -166,9 +219,10 @@ def convert_xls_to_xlsx(xls_path: str) -> str:
 # MAIN PUBLIC FUNCTION
 # ====================================================================
 
-def fill_excel_form(form_type: str, parsed_data: dict, user_id: int) -> dict:
+def fill_excel_form(form_type: str, data: AnnualLeaveRequest, user_id: int) -> dict:
     """
     Main function used by the backend tool to generate filled forms.
+    `data` is the request already validated by the caller.
 
     Returns { "file_path": "/abs/path/to/generated.xlsx" }
     """
@@ -182,61 +236,45 @@ def fill_excel_form(form_type: str, parsed_data: dict, user_id: int) -> dict:
     if not template_path.exists():
         return {"error": "template_not_found", "detail": str(template_path)}
 
-    # Validate data with schema
-    try:
-        data = AnnualLeaveRequest(**parsed_data)
-    except Exception as e:
-        return {"error": "validation_error", "detail": str(e)}
-
     # Output filename
     output_file = FILLED_FORMS_DIR / f"user_{user_id}_{form_type}_form.xlsx"
 
-    # Convert template if needed
-    if template_path.suffix == ".xls":
-        template_path = Path(convert_xls_to_xlsx(str(template_path)))
-
-    # Copy template → output
-    shutil.copy(template_path, output_file)
-
-    wb = load_workbook(output_file)
+    # Load the template from its cached bytes (no copy-to-output then
+    # re-read); external links are never needed and are skipped while parsing
+    template = _template_bytes(str(template_path), template_path.stat().st_mtime_ns)
+    wb = load_workbook(BytesIO(template), keep_links=False, rich_text=False)
     ws = wb.active
 
-    def write(r, c, value):
-        ws.cell(row=r, column=c).value = value
+    def write(cell, value):
+        # Single-call form: creates/fetches the cell and sets the value
+        ws.cell(row=cell[0], column=cell[1], value=value)
 
     # Fill employee info
-    full_name = f"{data.employee_name.first_name} " \
-                f"{(data.employee_name.middle_name + ' ') if data.employee_name.middle_name else ''}" \
-                f"{data.employee_name.last_name}"
+    name = data.employee_name
+    full_name = " ".join(filter(None, (name.first_name, name.middle_name, name.last_name)))
 
-    write(9, 3, full_name)
-    write(14, 2, data.employee_id)
+    write(NAME_CELL, full_name)
+    write(EMPLOYEE_ID_CELL, data.employee_id)
 
     # Leave type selection
-    type_cells = {
-        "annual": (5, 1, "☑ Annual"),
-        "accidental": (5, 4, "☑ Accidental"),
-        "marriage": (5, 9, "☑ Marriage"),
-        "other": (5, 14, f"☑ Other: {data.other_leave_description or ''}")
-    }
-
-    r, c, text = type_cells[data.leave_type.value]
-    write(r, c, text)
+    r, c, text = LEAVE_TYPE_CELLS[data.leave_type]
+    if data.leave_type == LeaveType.OTHER:
+        text += data.other_leave_description or ""
+    write((r, c), text)
 
     # Staff category
+    write(EMPLOYMENT_CELLS[data.staff_category, data.employment_type],
+          EMPLOYMENT_LABELS[data.employment_type])
     if data.staff_category == StaffCategory.ACADEMIC:
-        write(17, 1 if data.employment_type == EmploymentType.FULL_TIME else 5,
-              f"☑ {'Full time' if data.employment_type == EmploymentType.FULL_TIME else 'Part time'}")
-        write(18, 1, f"Faculty: {data.faculty or ''}\nDepartment: {data.department}")
+        department = f"Faculty: {data.faculty or ''}\nDepartment: {data.department}"
     else:
-        write(17, 10 if data.employment_type == EmploymentType.FULL_TIME else 15,
-              f"☑ {'Full time' if data.employment_type == EmploymentType.FULL_TIME else 'Part time'}")
-        write(18, 10, f"Department: {data.department}")
+        department = f"Department: {data.department}"
+    write(DEPARTMENT_CELLS[data.staff_category], department)
 
     # Leave period
-    write(19, 1, f"Leave from: {format_date(data.leave_from)}")
-    write(19, 10, f"to: {format_date(data.leave_to)}")
-    write(20, 4, str(data.total_leave_days))
+    write(LEAVE_FROM_CELL, f"Leave from: {format_date(data.leave_from)}")
+    write(LEAVE_TO_CELL, f"to: {format_date(data.leave_to)}")
+    write(TOTAL_DAYS_CELL, str(data.total_leave_days))
 
     # Save final file
     wb.save(output_file)
@@ -1,10 +1,27 @@
 # backend/utils/form_schemas.py
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Literal, Optional
 from datetime import date, time
 from dateutil import parser as date_parser
 
 
+def _to_date(v) -> date:
+    """Parse a date string; ISO dates (the usual LLM output) skip dateutil."""
+    try:
+        return date.fromisoformat(v)
+    except (TypeError, ValueError):
+        return date_parser.parse(v).date()
+
+
+def _to_time(v) -> time:
+    """Parse a time string; ISO times like "09:30" skip dateutil."""
+    try:
+        return time.fromisoformat(v)
+    except (TypeError, ValueError):
+        # dateutil can parse times as datetimes; extract time
+        return date_parser.parse(v).time()
+
+
 # ----------------------
 # Leave (annual / accidental / marriage)
 # ----------------------
@@ -21,13 +38,14 @@ class AnnualAccidentalMarriageLeaveForm(BaseModel):
     number_of_days: int
 
     # Accept flexible input for dates (strings)
-    @validator("start_date", "end_date", pre=True)
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
     def _parse_date(cls, v):
         if isinstance(v, date):
             return v
         if v is None or v == "":
             raise ValueError("date required")
-        return date_parser.parse(v).date()
+        return _to_date(v)
 
 
 # ----------------------
@@ -44,18 +62,19 @@ class ExcuseForm(BaseModel):
     from_time: time
     to_time: time
 
-    @validator("excuse_date", pre=True)
+    @field_validator("excuse_date", mode="before")
+    @classmethod
     def _parse_excuse_date(cls, v):
         if isinstance(v, date):
             return v
-        return date_parser.parse(v).date()
+        return _to_date(v)
 
-    @validator("from_time", "to_time", pre=True)
+    @field_validator("from_time", "to_time", mode="before")
+    @classmethod
     def _parse_time(cls, v):
         if isinstance(v, time):
             return v
-        # dateutil can parse times as datetimes; extract time
-        return date_parser.parse(v).time()
+        return _to_time(v)
 
 
 # ----------------------
@@ -74,11 +93,12 @@ class MaternityLeaveForm(BaseModel):
     medical_report: Literal["attached", "not_attached"]
     birth_certificate: Literal["attached", "not_attached"]
 
-    @validator("start_date", "end_date", pre=True)
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
     def _parse_date(cls, v):
         if isinstance(v, date):
             return v
-        return date_parser.parse(v).date()
+        return _to_date(v)
 
 
 # ----------------------
@@ -96,17 +116,19 @@ class MissionForm(BaseModel):
     to_time: time
     mission_destination: Optional[str] = None
 
-    @validator("start_date", "end_date", pre=True)
+    @field_validator("start_date", "end_date", mode="before")
+    @classmethod
     def _parse_date(cls, v):
         if isinstance(v, date):
             return v
-        return date_parser.parse(v).date()
+        return _to_date(v)
 
-    @validator("from_time", "to_time", pre=True)
+    @field_validator("from_time", "to_time", mode="before")
+    @classmethod
     def _parse_time(cls, v):
         if isinstance(v, time):
             return v
-        return date_parser.parse(v).time()
+        return _to_time(v)
 
 
 # ----------------------
@@ -122,17 +144,19 @@ class IncompleteAttendanceForm(BaseModel):
     missing_from_time: Optional[time] = None
     missing_to_time: Optional[time] = None
 
-    @validator("missing_date", pre=True)
+    @field_validator("missing_date", mode="before")
+    @classmethod
     def _parse_missing_date(cls, v):
         if isinstance(v, date):
             return v
-        return date_parser.parse(v).date()
+        return _to_date(v)
 
-    @validator("missing_from_time", "missing_to_time", pre=True)
+    @field_validator("missing_from_time", "missing_to_time", mode="before")
+    @classmethod
     def _parse_time_optional(cls, v):
         if v is None or v == "":
             return None
-        return date_parser.parse(v).time()
+        return _to_time(v)
 
 
 # ----------------------
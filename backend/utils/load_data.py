@@ -1,28 +1,111 @@
-# utils/load_user_data.py — DEBUG
-from database.db_connection import db
-from config import logger
-import traceback
-
-def dbg(title: str, payload=None):
-    logger.info("\n" + "-" * 72)
-    logger.info(f"📦 {title}")
-    if payload is not None:
-        try:
-            logger.info(f"payload: {payload}")
-        except Exception:
-            logger.info("payload: <unserializable>")
-    logger.info("-" * 72 + "\n")
-
-
-async def load_user_data(user_id: int):
-    dbg("LOAD_USER_DATA — START", {"user_id": user_id})
+# utils/load_data.py
+from database.db_connection import pg_fetchrow
+from config import logger, USER_DATA_CACHE_TTL, USER_DATA_CACHE_MAX_ENTRIES
+from collections import OrderedDict
+from typing import Optional, TypedDict
+import asyncio
+import time
+
+
+class UserBundle(TypedDict, total=False):
+    """Shape of the jsonb document built by USER_DATA_SQL."""
+    user: Optional[dict]
+    academic: Optional[dict]
+    leaves: Optional[dict]
+    training: Optional[list]
+    chat_history: Optional[list]
+    error: str
+
+
+USER_DATA_SQL = """
+SELECT jsonb_build_object(
+    'user', to_jsonb(u) - 'password',
+    'academic', (SELECT to_jsonb(a) FROM academic_profile a WHERE a.user_id = u.user_id LIMIT 1),
+    'leaves', (SELECT to_jsonb(l) FROM leave_balances l WHERE l.user_id = u.user_id LIMIT 1),
+    'training', COALESCE(
+        (SELECT jsonb_agg(t) FROM training_records t WHERE t.user_id = u.user_id),
+        '[]'::jsonb
+    ),
+    'chat_history', COALESCE(
+        (SELECT jsonb_agg(c ORDER BY c.created_at DESC) FROM conversations c WHERE c.user_id = u.user_id),
+        '[]'::jsonb
+    )
+) AS data
+FROM users u
+WHERE u.user_id = $1
+"""
+
+
+# user_id -> (expires_at, data); shared read-only between callers
+_user_data_cache: "OrderedDict[int, tuple[float, UserBundle]]" = OrderedDict()
+# user_id -> in-flight fetch task, so concurrent misses share one round-trip
+_user_data_inflight: dict[int, asyncio.Task] = {}
+# user_id -> invalidation count; a fetch that started before the latest
+# invalidation may have read pre-write data and is not cached
+_user_data_generation: dict[int, int] = {}
+
+
+def invalidate_user_data(user_id: int):
+    """Drop the cached bundle after a write that changes the user's data."""
+    _user_data_cache.pop(user_id, None)
+    _user_data_generation[user_id] = _user_data_generation.get(user_id, 0) + 1
+    # Later callers start a fresh fetch instead of joining the stale one
+    _user_data_inflight.pop(user_id, None)
+
+
+async def load_user_data(user_id: int) -> UserBundle:
+    """
+    Return the user's data bundle, from the in-process TTL cache when fresh.
+
+    The returned dict is shared with other callers and must not be mutated.
+    """
+    cached = _user_data_cache.get(user_id)
+    if cached and cached[0] > time.monotonic():
+        _user_data_cache.move_to_end(user_id)
+        return cached[1]
+
+    # Concurrent misses share one fetch task. Callers await it shielded, so
+    # a cancelled caller (e.g. client disconnect) neither cancels the fetch
+    # nor strands the others.
+    inflight = _user_data_inflight.get(user_id)
+    if inflight is None:
+        inflight = asyncio.create_task(_fetch_and_cache(user_id))
+        _user_data_inflight[user_id] = inflight
+        inflight.add_done_callback(lambda task: _fetch_done(user_id, task))
+    return await asyncio.shield(inflight)
+
+
+def _fetch_done(user_id: int, task: asyncio.Task):
+    if _user_data_inflight.get(user_id) is task:
+        del _user_data_inflight[user_id]
+    # Mark retrieved so waiter-less failures do not warn at GC time
+    if not task.cancelled():
+        task.exception()
+
+
+async def _fetch_and_cache(user_id: int) -> UserBundle:
+    generation = _user_data_generation.get(user_id, 0)
+    data = await _fetch_user_data(user_id)
+    if data.get("user") is not None and _user_data_generation.get(user_id, 0) == generation:
+        _user_data_cache[user_id] = (time.monotonic() + USER_DATA_CACHE_TTL, data)
+        _user_data_cache.move_to_end(user_id)
+        if len(_user_data_cache) > USER_DATA_CACHE_MAX_ENTRIES:
+            _user_data_cache.popitem(last=False)
+    return data
+
+
+async def _fetch_user_data(user_id: int) -> UserBundle:
+    """
+    Load the user's profile, academic record, leave balances, trainings and
+    conversations in a single round-trip; Postgres assembles the JSON.
+
+    Runs on the raw asyncpg pool, so the statement is prepared once per
+    connection and the jsonb result is decoded straight into a dict.
+    """
     try:
-        # 1) user
-        dbg("QUERY: users", {"sql": "SELECT * FROM users WHERE user_id = :uid", "uid": user_id})
-        user = await db.fetch_one("SELECT * FROM users WHERE user_id = :uid", {"uid": user_id})
-        dbg("USER RESULT", {"user": dict(user) if user else None})
-        if not user:
-            logger.warning("User not found in load_user_data")
+        row = await pg_fetchrow(USER_DATA_SQL, user_id)
+        if not row:
+            logger.warning("User %s not found in load_user_data", user_id)
             return {
                 "error": "User not found",
                 "user": None,
@@ -32,38 +115,7 @@ async def load_user_data(user_id: int):
                 "chat_history": None
             }
 
-        # 2) academic profile
-        dbg("QUERY: academic_profile", {"sql": "SELECT * FROM academic_profile WHERE user_id = :uid", "uid": user_id})
-        academic = await db.fetch_one("SELECT * FROM academic_profile WHERE user_id = :uid", {"uid": user_id})
-        dbg("ACADEMIC RESULT", {"academic": dict(academic) if academic else None})
-
-        # 3) leaves
-        dbg("QUERY: leave_balances", {"sql": "SELECT * FROM leave_balances WHERE user_id = :uid", "uid": user_id})
-        leaves = await db.fetch_one("SELECT * FROM leave_balances WHERE user_id = :uid", {"uid": user_id})
-        dbg("LEAVES RESULT", {"leaves": dict(leaves) if leaves else None})
-
-        # 4) training records (multiple)
-        dbg("QUERY: training_records", {"sql": "SELECT * FROM training_records WHERE user_id = :uid", "uid": user_id})
-        training_rows = await db.fetch_all("SELECT * FROM training_records WHERE user_id = :uid", {"uid": user_id})
-        training = [dict(row) for row in training_rows] if training_rows else []
-        dbg("TRAINING RESULT", {"count": len(training)})
-
-        # 5) chat history
-        dbg("QUERY: conversations", {"sql": "SELECT * FROM conversations WHERE user_id = :uid ORDER BY created_at DESC", "uid": user_id})
-        chat_rows = await db.fetch_all("SELECT * FROM conversations WHERE user_id = :uid ORDER BY created_at DESC", {"uid": user_id})
-        chat_history = [dict(row) for row in chat_rows] if chat_rows else []
-        dbg("CHAT HISTORY RESULT", {"count": len(chat_history)})
-
-        result = {
-            "user": dict(user),
-            "academic": dict(academic) if academic else None,
-            "leaves": dict(leaves) if leaves else None,
-            "training": training,
-            "chat_history": chat_history
-        }
-        dbg("LOAD_USER_DATA — FINAL", {"keys": list(result.keys())})
-        return result
+        return row["data"]
     except Exception:
-        logger.error("Exception in load_user_data")
-        logger.error(traceback.format_exc())
+        logger.exception("Exception in load_user_data for user %s", user_id)
         raise
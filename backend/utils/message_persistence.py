@@ -3,11 +3,90 @@ Message Persistence Utilities
 Handles saving messages to the database during agent execution.
 """
 
-import json
-from typing import Any, Dict, Optional
-from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
-from database.db_connection import db
-from config import logger
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Container, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+from database.db_connection import pg_fetch, pg_fetchrow
+from config import logger, CONVERSATION_TOUCH_INTERVAL
+
+
+# copilot_message_ids this process has already written (or found stored), so
+# re-sent messages are skipped without a round-trip. Only a shortcut: the
+# unique index + ON CONFLICT still dedups anything this misses.
+_RECENT_COPILOT_IDS_MAX = 10_000
+_recent_copilot_ids: "OrderedDict[str, None]" = OrderedDict()
+
+
+def _seen_copilot_id(copilot_id: str) -> bool:
+    if copilot_id in _recent_copilot_ids:
+        _recent_copilot_ids.move_to_end(copilot_id)
+        return True
+    return False
+
+
+def _remember_copilot_ids(copilot_ids) -> None:
+    for copilot_id in copilot_ids:
+        if copilot_id:
+            _recent_copilot_ids[copilot_id] = None
+            _recent_copilot_ids.move_to_end(copilot_id)
+    while len(_recent_copilot_ids) > _RECENT_COPILOT_IDS_MAX:
+        _recent_copilot_ids.popitem(last=False)
+
+
+# conversation_id -> monotonic time of the last updated_at bump by this
+# process. A burst of saves bumps the row once instead of once per message;
+# conversations whose bump was skipped wait in _pending_touch for the
+# trailing bump (flush_conversation_touches).
+_last_conv_touch: Dict[int, float] = {}
+_pending_touch: Set[int] = set()
+
+TOUCH_CONVERSATIONS_SQL = """
+UPDATE conversations
+SET updated_at = CURRENT_TIMESTAMP
+WHERE conversation_id = ANY(CAST($1 AS INTEGER[]))
+"""
+
+
+def _touch_due(conversation_id: int) -> bool:
+    last = _last_conv_touch.get(conversation_id)
+    return last is None or time.monotonic() - last >= CONVERSATION_TOUCH_INTERVAL
+
+
+def _touch_skipped(conversation_id: int) -> None:
+    _pending_touch.add(conversation_id)
+
+
+def _touched(conversation_id: int) -> None:
+    _pending_touch.discard(conversation_id)
+    _last_conv_touch[conversation_id] = time.monotonic()
+    if len(_last_conv_touch) > 10_000:
+        cutoff = time.monotonic() - CONVERSATION_TOUCH_INTERVAL
+        for key in [k for k, t in _last_conv_touch.items() if t < cutoff]:
+            del _last_conv_touch[key]
+
+
+# Constant text on the raw asyncpg pool, so its statement cache prepares it
+# once per connection and every later save only sends Bind/Execute
+SAVE_MESSAGE_SQL = """
+WITH ins AS (
+    INSERT INTO messages (conversation_id, role, content, copilot_message_id)
+    VALUES ($1, $2, $3, $4)
+    ON CONFLICT (copilot_message_id) DO NOTHING
+    RETURNING message_id
+),
+conv AS (
+    UPDATE conversations
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE conversation_id = $1
+      AND CAST($5 AS BOOLEAN)
+      AND EXISTS (SELECT 1 FROM ins)
+)
+SELECT message_id FROM ins
+"""
 
 
 async def save_message_to_db(
@@ -16,76 +95,203 @@ async def save_message_to_db(
     content: Dict[str, Any]
 ) -> Optional[int]:
     try:
+        copilot_id = content.get("metadata", {}).get("copilot_message_id")
+
+        if copilot_id and _seen_copilot_id(copilot_id):
+            logger.debug("⏭️ Skipping recently saved message %s", copilot_id)
+            return None
+
         # --------------------------------------------------
         # ✅ DEDUPLICATION BY copilot_message_id
+        # Insert, dedup (unique index + ON CONFLICT) and the conversation
+        # updated_at bump all happen in one statement / round-trip; a
+        # duplicate simply returns no row
         # --------------------------------------------------
-        copilot_id = content.get("metadata", {}).get("copilot_message_id")
+        touch = _touch_due(conversation_id)
+        result = await pg_fetchrow(SAVE_MESSAGE_SQL, conversation_id, role, content, copilot_id, touch)
+        # Inserted or already stored: either way it is in the table now
+        _remember_copilot_ids((copilot_id,))
 
-        if copilot_id:
-            exists = await db.fetch_one(
-                "SELECT 1 FROM messages WHERE copilot_message_id = :id",
-                {"id": copilot_id}
-            )
-            if exists:
-                logger.info(f"⏭️ Skipping duplicate message {copilot_id}")
-                return None
-        # --------------------------------------------------
+        if not result:
+            logger.debug("⏭️ Skipping duplicate message %s", copilot_id)
+            return None
+        if touch:
+            _touched(conversation_id)
+        else:
+            _touch_skipped(conversation_id)
+
+        logger.debug(
+            "✅ Saved message %s (role=%s, copilot_id=%s)",
+            result["message_id"], role, copilot_id
+        )
+        return result["message_id"]
+
+    except asyncpg.PostgresError as e:
+        # Routine DB failure: the server message says it all, no traceback
+        logger.error("❌ Failed to save message to DB: %s", e)
+        return None
+    except Exception:
+        logger.exception("❌ Failed to save message to DB")
+        return None
 
-        query = """
-        INSERT INTO messages (conversation_id, role, content, copilot_message_id)
-        VALUES (:conversation_id, :role, :content, :copilot_message_id)
-        RETURNING message_id
-        """
 
-        values = {
-            "conversation_id": conversation_id,
-            "role": role,
-            "content": json.dumps(content, ensure_ascii=False),
-            "copilot_message_id": copilot_id
-        }
 
-        result = await db.fetch_one(query=query, values=values)
+# One round-trip for a whole turn (raw asyncpg pool, $n placeholders): unnest the rows, insert them skipping
+# ones already saved (ON CONFLICT on copilot_message_id) and bump conversations.updated_at ($4: bump due)
+SAVE_MESSAGES_SQL = """
+WITH rows AS (
+    SELECT r.role, r.content, r.content->'metadata'->>'copilot_message_id' AS copilot_message_id, r.ord
+    FROM unnest(CAST($2 AS VARCHAR[]), CAST($3 AS JSONB[]))
+         WITH ORDINALITY AS r(role, content, ord)
+),
+ins AS (
+    INSERT INTO messages (conversation_id, role, content, copilot_message_id)
+    SELECT CAST($1 AS INTEGER), rows.role, rows.content, rows.copilot_message_id
+    FROM rows
+    ORDER BY rows.ord
+    ON CONFLICT (copilot_message_id) DO NOTHING
+    RETURNING message_id
+),
+conv AS (
+    UPDATE conversations
+    SET updated_at = CURRENT_TIMESTAMP
+    WHERE conversation_id = CAST($1 AS INTEGER)
+      AND CAST($4 AS BOOLEAN)
+      AND EXISTS (SELECT 1 FROM ins)
+)
+SELECT message_id FROM ins
+"""
+
+
+async def save_messages_to_db(
+    conversation_id: int,
+    messages: List[Tuple[str, Dict[str, Any]]]
+) -> List[int]:
+    """
+    Save several messages of one turn in a single statement.
 
-        await db.execute(
-            "UPDATE conversations SET updated_at = CURRENT_TIMESTAMP WHERE conversation_id = :id",
-            {"id": conversation_id}
+    Args:
+        conversation_id: The conversation ID
+        messages: (role, content) pairs in conversation order
+
+    Returns:
+        message_ids of the inserted rows (duplicates are skipped)
+    """
+    # Drop in-batch duplicates and recently saved messages up front so they
+    # are not even sent
+    seen = set()
+    rows = []
+    for role, content in messages:
+        copilot_id = content.get("metadata", {}).get("copilot_message_id")
+        if copilot_id:
+            if copilot_id in seen or _seen_copilot_id(copilot_id):
+                continue
+            seen.add(copilot_id)
+        rows.append((role, content))
+
+    if not rows:
+        return []
+
+    try:
+        touch = _touch_due(conversation_id)
+        result = await pg_fetch(
+            SAVE_MESSAGES_SQL,
+            conversation_id,
+            [role for role, _ in rows],
+            [content for _, content in rows],
+            touch,
+        )
+        message_ids = [row["message_id"] for row in result]
+        _remember_copilot_ids(seen)
+        if message_ids:
+            if touch:
+                _touched(conversation_id)
+            else:
+                _touch_skipped(conversation_id)
+        logger.debug(
+            "✅ Saved %s/%s message(s) to conversation %s",
+            len(message_ids), len(rows), conversation_id
         )
+        return message_ids
 
-        if result:
-            logger.info(
-                f"✅ Saved message {result['message_id']} "
-                f"(role={role}, copilot_id={copilot_id})"
-            )
-            return result["message_id"]
+    except asyncpg.PostgresError as e:
+        logger.error("❌ Failed to save messages to DB: %s", e)
+        return []
+    except Exception:
+        logger.exception("❌ Failed to save messages to DB")
+        return []
 
-        return None
 
-    except Exception as e:
-        logger.exception(f"❌ Failed to save message to DB: {e}")
+
+def next_touch_delay() -> Optional[float]:
+    """Seconds until the earliest skipped bump is due (None if none are pending)."""
+    if not _pending_touch:
         return None
+    now = time.monotonic()
+    return max(0.0, min(
+        _last_conv_touch.get(c, now - CONVERSATION_TOUCH_INTERVAL) + CONVERSATION_TOUCH_INTERVAL - now
+        for c in _pending_touch
+    ))
+
 
+async def flush_conversation_touches(force: bool = False) -> None:
+    """
+    Apply the trailing updated_at bump skipped by the debounce, for every
+    pending conversation whose interval has passed (all of them if `force`),
+    in one UPDATE.
+    """
+    due = [c for c in _pending_touch if force or _touch_due(c)]
+    if not due:
+        return
+    try:
+        await pg_fetch(TOUCH_CONVERSATIONS_SQL, due)
+    except Exception as e:
+        logger.error("❌ Failed to bump conversations.updated_at: %s", e)
+        # Keep them pending and retry after another interval
+        now = time.monotonic()
+        for conversation_id in due:
+            _last_conv_touch[conversation_id] = now
+        return
+    for conversation_id in due:
+        _touched(conversation_id)
 
 
 def extract_message_content(message):
-    if not hasattr(message, "content"):
-        return None
-
-    text = message.content.strip() if isinstance(message.content, str) else ""
+    content = getattr(message, "content", None)
 
     # 🚫 Skip empty / system / lifecycle messages
-    if not text:
+    if not isinstance(content, str) or not (text := content.strip()):
         return None
 
-    return {
-        "text": text,
-        "metadata": {
-            "copilot_message_id": getattr(message, "id", None),
-            "timestamp": message.additional_kwargs.get("timestamp")
-        }
-    }
+    copilot_id = getattr(message, "id", None)
+    timestamp = (getattr(message, "additional_kwargs", None) or {}).get("timestamp")
+
+    # Metadata only carries the fields that are set (readers use .get and
+    # tolerate it missing altogether)
+    if copilot_id is None and timestamp is None:
+        return {"text": text}
+    metadata = {}
+    if copilot_id is not None:
+        metadata["copilot_message_id"] = copilot_id
+    if timestamp is not None:
+        metadata["timestamp"] = timestamp
+    return {"text": text, "metadata": metadata}
+
 
 
 
+# LangChain message .type -> database role (chunks carry their own type names)
+_TYPE_TO_ROLE = {
+    "human": "user",
+    "HumanMessageChunk": "user",
+    "ai": "assistant",
+    "AIMessageChunk": "assistant",
+    "system": "system",
+    "SystemMessageChunk": "system",
+    "tool": "tool",
+    "ToolMessageChunk": "tool",
+}
+
 
 def message_type_to_role(message) -> str:
     """
@@ -97,43 +303,145 @@ def message_type_to_role(message) -> str:
     Returns:
         Role string (user, assistant, system, tool)
     """
-    if isinstance(message, HumanMessage):
-        return "user"
-    elif isinstance(message, AIMessage):
-        return "assistant"
-    elif isinstance(message, SystemMessage):
-        return "system"
-    elif isinstance(message, ToolMessage):
-        return "tool"
-    else:
-        # Fallback based on message type attribute
-        message_type = getattr(message, "type", "unknown")
-        type_to_role = {
-            "human": "user",
-            "ai": "assistant",
-            "system": "system",
-            "tool": "tool"
-        }
-        return type_to_role.get(message_type, "user")
-
-
-async def save_langchain_message(
+    return _TYPE_TO_ROLE.get(getattr(message, "type", None), "user")
+
+
+def to_message_rows(
+    messages: List[Any],
+    roles: Optional[Container[str]] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Turn LangChain messages into (role, content) rows for save_messages_to_db.
+
+    Args:
+        messages: LangChain message objects in conversation order
+        roles: Only keep messages whose role is in `roles` (all if None)
+    """
+    rows = []
+    for message in messages:
+        role = message_type_to_role(message)
+        if roles is not None and role not in roles:
+            continue
+        content = extract_message_content(message)
+        if content:
+            rows.append((role, content))
+    return rows
+
+
+async def save_langchain_messages(
     conversation_id: int,
-    message
-) -> Optional[int]:
+    messages: List[Any],
+    roles: Optional[Container[str]] = None
+) -> List[int]:
     """
-    Save a LangChain message object to the database.
+    Save the LangChain messages of one turn with a single save_messages_to_db call.
 
     Args:
         conversation_id: The conversation ID
-        message: LangChain message object
+        messages: LangChain message objects in conversation order
+        roles: Only save messages whose role is in `roles` (all if None)
 
     Returns:
-        message_id if successful, None otherwise
+        message_ids of the inserted rows
+    """
+    rows = to_message_rows(messages, roles)
+    if not rows:
+        return []
+    return await save_messages_to_db(conversation_id, rows)
+
+
+class MessagePersistenceWorker:
+    """
+    Background writer that takes message persistence off the request path.
+
+    Callers enqueue (conversation_id, rows) without waiting; one consumer
+    task drains the queue, collecting up to `max_batch` entries or whatever
+    arrives within `flush_ms`, and writes each conversation's rows with one
+    save_messages_to_db call. A single FIFO consumer keeps every
+    conversation's messages in the order they were enqueued.
     """
-    role = message_type_to_role(message)
-    content = extract_message_content(message)
-    if content is None:
-        return None  # 🚫 DO NOT SAVE
 
-    return await save_message_to_db(conversation_id, role, content)
+    def __init__(self, max_batch: int = 50, flush_ms: int = 100):
+        self.max_batch = max_batch
+        self.flush_ms = flush_ms
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._direct: set = set()
+
+    def start(self) -> None:
+        """Start the consumer on the running event loop (app startup)."""
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    def enqueue(self, conversation_id: int, rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Queue `rows` for `conversation_id`; returns immediately."""
+        if not rows:
+            return
+        if self._task is None:
+            # Not started (e.g. scripts): write directly instead of dropping
+            task = asyncio.get_running_loop().create_task(save_messages_to_db(conversation_id, rows))
+            self._direct.add(task)
+            task.add_done_callback(self._direct.discard)
+            return
+        self.queue.put_nowait((conversation_id, rows))
+
+    async def flush(self) -> None:
+        """Wait until everything enqueued so far has been written."""
+        if self.queue is not None:
+            await self.queue.join()
+
+    async def stop(self) -> None:
+        """Flush pending writes and updated_at bumps, then stop the consumer (app shutdown)."""
+        if self._task is None:
+            return
+        await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await flush_conversation_touches(force=True)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            # Idle: wake up when a skipped updated_at bump falls due
+            try:
+                first = await asyncio.wait_for(self.queue.get(), next_touch_delay())
+            except asyncio.TimeoutError:
+                await flush_conversation_touches()
+                continue
+
+            batch = [first]
+            deadline = loop.time() + self.flush_ms / 1000
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                await self._write(batch)
+                await flush_conversation_touches()
+            except Exception:
+                logger.exception("❌ Message persistence batch failed")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    @staticmethod
+    async def _write(batch: List[Tuple[int, List[Tuple[str, Dict[str, Any]]]]]) -> None:
+        # Merge entries per conversation, preserving arrival order
+        by_conversation: Dict[int, List[Tuple[str, Dict[str, Any]]]] = {}
+        for conversation_id, rows in batch:
+            by_conversation.setdefault(conversation_id, []).extend(rows)
+        for conversation_id, rows in by_conversation.items():
+            await save_messages_to_db(conversation_id, rows)
+
+
+# Process-wide writer; started and stopped by the app lifespan
+message_writer = MessagePersistenceWorker()
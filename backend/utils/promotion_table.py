@@ -1,3 +1,8 @@
+from types import MappingProxyType
+
+import orjson
+
+
 PROMOTION_TABLE_LECTURER_TO_AP = {
     "type": "promotion_table_data",
     "categories": [
@@ -59,3 +64,53 @@ PROMOTION_TABLE_LECTURER_TO_AP = {
     }
 }
 
+
+# Serialized once at import: the table is static, so neither the tool nor the
+# HTTP endpoint re-encodes it per request
+PROMOTION_TABLE_JSON: bytes = orjson.dumps(PROMOTION_TABLE_LECTURER_TO_AP)
+
+
+def _freeze(value):
+    """Read-only copy: dicts become mapping proxies, lists become tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# Frozen after serializing, so nothing can mutate the table and leave
+# PROMOTION_TABLE_JSON describing something else
+PROMOTION_TABLE_LECTURER_TO_AP = _freeze(PROMOTION_TABLE_LECTURER_TO_AP)
+
+
+# Aggregates derived once at import: (title, required_numbers, required_score)
+# per category, summed over its rows
+CATEGORY_REQUIREMENTS = tuple(
+    (
+        category["title"],
+        sum(row["min_required_numbers"] for row in category["rows"]),
+        sum(row["min_required_score"] for row in category["rows"]),
+    )
+    for category in PROMOTION_TABLE_LECTURER_TO_AP["categories"]
+)
+
+# Overall thresholds come from the footer, not from the rows: the guidelines
+# ask for more in total (14 / 18) than the per-row minimums add up to (13 / 17)
+PROMOTION_TABLE_TOTAL_NUMBERS: int = PROMOTION_TABLE_LECTURER_TO_AP["footer"]["overall_total_numbers"]
+PROMOTION_TABLE_TOTAL_SCORE: int = PROMOTION_TABLE_LECTURER_TO_AP["footer"]["overall_total_score"]
+
+# Checked explicitly (asserts vanish under -O): a footer below the row sums
+# would make the overall check weaker than the per-category ones
+_rows_numbers = sum(n for _, n, _ in CATEGORY_REQUIREMENTS)
+_rows_score = sum(s for _, _, s in CATEGORY_REQUIREMENTS)
+if PROMOTION_TABLE_TOTAL_NUMBERS < _rows_numbers:
+    raise ValueError(
+        f"Promotion table footer overall_total_numbers ({PROMOTION_TABLE_TOTAL_NUMBERS}) "
+        f"is below the sum of the category minimums ({_rows_numbers})"
+    )
+if PROMOTION_TABLE_TOTAL_SCORE < _rows_score:
+    raise ValueError(
+        f"Promotion table footer overall_total_score ({PROMOTION_TABLE_TOTAL_SCORE}) "
+        f"is below the sum of the category minimums ({_rows_score})"
+    )
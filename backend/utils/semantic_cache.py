@@ -0,0 +1,170 @@
+"""
+Semantic Caches
+Short-circuit LLM calls and policy retrieval for near-duplicate questions.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStoreRetriever
+
+from config import logger
+
+
+class SemanticCache:
+    """
+    In-process cache of values (assistant answers, retrieved chunks) keyed on
+    the embedding of the question that produced them.
+
+    Entries are scoped (e.g. per conversation) so answers are never served
+    outside the context they were produced in. Each scope keeps at most
+    `max_entries` values and evicts the least recently used one when full;
+    at most `max_scopes` scopes are kept, least recently used dropped first.
+    With `ttl` set, entries older than `ttl` seconds are dropped so answers
+    do not outlive policy/user changes.
+    """
+
+    def __init__(
+        self,
+        embeddings,
+        threshold: float = 0.95,
+        max_entries: int = 256,
+        ttl: Optional[float] = None,
+        max_scopes: int = 10_000,
+    ):
+        self.embeddings = embeddings
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_scopes = max_scopes
+        self._scopes: "OrderedDict[Any, OrderedDict]" = OrderedDict()
+        self._vectors: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _normalize(text: str) -> str:
+        return " ".join(text.lower().split())
+
+    def embed(self, question: str) -> np.ndarray:
+        """
+        Return the unit-length embedding of `question`.
+
+        Vectors are memoized, so lookup, store and callers that need the
+        vector for their own search share a single embeddings call.
+        """
+        text = self._normalize(question)
+        with self._lock:
+            vector = self._vectors.get(text)
+            if vector is not None:
+                self._vectors.move_to_end(text)
+                return vector
+
+        vector = np.asarray(self.embeddings.embed_query(text), dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+
+        with self._lock:
+            self._vectors[text] = vector
+            if len(self._vectors) > self.max_entries:
+                self._vectors.popitem(last=False)
+        return vector
+
+    def _purge_expired(self, entries: OrderedDict) -> None:
+        """Drop expired entries (caller holds the lock)."""
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        for key in [k for k, (_, _, stored_at) in entries.items() if stored_at < cutoff]:
+            del entries[key]
+
+    def lookup(self, scope: Any, question: str) -> Optional[Any]:
+        """
+        Return the cached value whose question is similar enough to `question`.
+
+        Returns:
+            The cached value, or None on a miss
+        """
+        text = self._normalize(question)
+        if not text:
+            return None
+
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if entries:
+                self._purge_expired(entries)
+            if not entries:
+                return None
+            exact = entries.get(text)
+            if exact is not None:
+                entries.move_to_end(text)
+                return exact[1]
+
+        vector = self.embed(text)
+
+        with self._lock:
+            entries = self._scopes.get(scope)
+            if not entries:
+                return None
+            keys = list(entries.keys())
+            matrix = np.stack([entries[k][0] for k in keys])
+            scores = matrix @ vector
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                return None
+            entries.move_to_end(keys[best])
+            logger.debug("Semantic cache hit (score=%.3f)", scores[best])
+            return entries[keys[best]][1]
+
+    def store(self, scope: Any, question: str, value: Any) -> None:
+        """Remember the value produced for `question` within `scope`."""
+        text = self._normalize(question)
+        if not text or value is None:
+            return
+
+        vector = self.embed(text)
+
+        with self._lock:
+            entries = self._scopes.setdefault(scope, OrderedDict())
+            self._scopes.move_to_end(scope)
+            if len(self._scopes) > self.max_scopes:
+                self._scopes.popitem(last=False)
+            entries[text] = (vector, value, time.monotonic())
+            entries.move_to_end(text)
+            if len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+
+class CachedRetriever(BaseRetriever):
+    """
+    Vector store retriever that reuses the documents of an earlier, similar
+    query instead of searching again.
+
+    Policy documents are the same for every user, so all entries share one
+    scope. On a miss the query vector computed for the cache lookup is reused
+    for the vector search, so the query is embedded only once.
+    """
+
+    retriever: VectorStoreRetriever
+    cache: Any
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        cached = self.cache.lookup(None, query)
+        if cached is not None:
+            logger.debug("Retrieval cache hit for query=%s", query)
+            return cached
+
+        vector = self.cache.embed(query)
+        docs = self.retriever.vectorstore.similarity_search_by_vector(
+            vector.tolist(), **self.retriever.search_kwargs
+        )
+        self.cache.store(None, query, docs)
+        return docs
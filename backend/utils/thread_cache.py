@@ -0,0 +1,109 @@
+"""
+Thread Cache
+In-process thread_id -> conversation_id map, so chat requests skip the
+conversation lookup query. The mapping never changes once a conversation
+exists; it only goes away when the conversation is hard-deleted.
+Lookups are scoped to the caller: a thread only resolves for the user who
+owns its conversation.
+"""
+
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from database.db_connection import pg_fetchrow
+from utils.load_data import invalidate_user_data
+from config import logger, THREAD_CACHE_TTL, THREAD_CACHE_MAX_ENTRIES
+
+
+# Hot-path statements, run on the raw asyncpg pool ($n placeholders).
+# xmax = 0 only for a freshly inserted row, so `created` tells a new
+# conversation apart from an existing one hit through ON CONFLICT.
+# The DO UPDATE only fires for the same owner; a thread that belongs to
+# another user returns no row.
+UPSERT_CONVERSATION_SQL = """
+INSERT INTO conversations (user_id, title, thread_id)
+VALUES ($1, $2, $3)
+ON CONFLICT (thread_id) DO UPDATE SET thread_id = EXCLUDED.thread_id
+WHERE conversations.user_id = EXCLUDED.user_id
+RETURNING conversation_id, (xmax = 0) AS created
+"""
+
+# Anonymous callers only reach conversations that have no owner
+CONVERSATION_BY_THREAD_SQL = """
+SELECT conversation_id, FALSE AS created
+FROM conversations
+WHERE thread_id = $1 AND user_id IS NULL
+"""
+
+
+# thread_id -> (expires_at, conversation_id, owner user_id)
+_thread_conversations: "OrderedDict[str, tuple[float, int, Optional[int]]]" = OrderedDict()
+
+
+def get_cached_conversation_id(thread_id: str, user_id: Optional[int]) -> Optional[int]:
+    """Return the cached conversation_id for `thread_id` if `user_id` owns it, else None."""
+    cached = _thread_conversations.get(thread_id)
+    if not cached:
+        return None
+    if cached[0] <= time.monotonic():
+        _thread_conversations.pop(thread_id, None)
+        return None
+    if cached[2] != user_id:
+        return None
+    _thread_conversations.move_to_end(thread_id)
+    return cached[1]
+
+
+def cache_conversation_id(thread_id: str, conversation_id: int, user_id: Optional[int]):
+    """Remember the conversation a thread belongs to, and its owner."""
+    _thread_conversations[thread_id] = (time.monotonic() + THREAD_CACHE_TTL, conversation_id, user_id)
+    _thread_conversations.move_to_end(thread_id)
+    if len(_thread_conversations) > THREAD_CACHE_MAX_ENTRIES:
+        _thread_conversations.popitem(last=False)
+
+
+def invalidate_thread(thread_id: str):
+    """Forget a thread after its conversation is deleted."""
+    _thread_conversations.pop(thread_id, None)
+
+
+async def resolve_conversation_id(user_id: Optional[int], thread_id: str) -> Optional[int]:
+    """
+    Return the conversation a thread belongs to: cache first, then the
+    database. With a user_id the conversation is created on first use.
+    Returns None (and logs) when it cannot be resolved or the thread's
+    conversation is owned by someone else.
+    """
+    conversation_id = get_cached_conversation_id(thread_id, user_id)
+    if conversation_id is not None:
+        logger.debug("Cached conversation_id=%s for thread_id=%s", conversation_id, thread_id)
+        return conversation_id
+
+    try:
+        if user_id:
+            # Lookup + auto-create in one round-trip; concurrent
+            # requests for a new thread resolve to the same row
+            logger.debug("Upserting conversation: user_id=%s thread_id=%s", user_id, thread_id)
+            result = await pg_fetchrow(UPSERT_CONVERSATION_SQL, user_id, "New Conversation", thread_id)
+        else:
+            result = await pg_fetchrow(CONVERSATION_BY_THREAD_SQL, thread_id)
+    except Exception:
+        logger.exception("Error while looking up / creating conversation")
+        return None
+
+    if not result:
+        if user_id:
+            logger.warning("thread_id=%s belongs to another user — not resolving for user_id=%s", thread_id, user_id)
+        else:
+            logger.warning("No conversation for thread_id=%s and no user_id — cannot auto-create", thread_id)
+        return None
+
+    conversation_id = result["conversation_id"]
+    cache_conversation_id(thread_id, conversation_id, user_id)
+    if result["created"]:
+        logger.info("Auto-created conversation_id=%s", conversation_id)
+        invalidate_user_data(user_id)
+    else:
+        logger.debug("Found conversation_id=%s for thread_id=%s", conversation_id, thread_id)
+    return conversation_id
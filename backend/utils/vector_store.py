@@ -0,0 +1,139 @@
+"""
+Policy Vector Store
+FAISS index over the policy chunks, wrapped in LangChain's FAISS store.
+Vectors are unit-normalized and searched by inner product (cosine).
+"""
+
+import math
+import warnings
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.embeddings import Embeddings
+
+from config import (
+    logger,
+    VECTOR_INDEX_TYPE,
+    VECTOR_HNSW_M,
+    VECTOR_EF_SEARCH,
+    VECTOR_MIN_RECALL,
+    VECTOR_IVFPQ_MIN_CHUNKS,
+    VECTOR_PQ_M,
+    VECTOR_IVF_NPROBE,
+    VECTOR_REFINE_K_FACTOR,
+)
+
+# Part of the saved index fingerprint: a different index type rebuilds it
+VECTOR_INDEX_ID = f"faiss:{VECTOR_INDEX_TYPE}"
+
+# LangChain does not pickle these with the store; pass them on build and load.
+# Inner product on L2-normalized vectors is cosine similarity in [-1, 1]
+# (slightly outside with int8 codes), mapped to a [0, 1] relevance score.
+_STORE_KWARGS = {
+    "distance_strategy": DistanceStrategy.MAX_INNER_PRODUCT,
+    "normalize_L2": True,
+    "relevance_score_fn": lambda score: min(1.0, max(0.0, (score + 1.0) / 2.0)),
+}
+
+# LangChain warns about normalize_L2 for any non-euclidean metric; with inner
+# product it is exactly what turns the search into cosine similarity
+warnings.filterwarnings("ignore", message="Normalizing L2 is not applicable")
+
+_RECALL_K = 10
+_RECALL_SAMPLE = 200
+_IVFPQ_TRAIN_SAMPLE = 10_000
+
+
+def _resolve_index_type(index_type: str, n: int, dim: int) -> str:
+    if index_type == "ivfpq":
+        if n < VECTOR_IVFPQ_MIN_CHUNKS:
+            logger.info("%s chunks is too few to train IVF-PQ — using hnsw_sq8", n)
+            return "hnsw_sq8"
+        if dim % VECTOR_PQ_M:
+            logger.warning("Dimension %s is not divisible by VECTOR_PQ_M=%s — using hnsw_sq8", dim, VECTOR_PQ_M)
+            return "hnsw_sq8"
+    return index_type
+
+
+def _create_index(n: int, dim: int, index_type: str) -> faiss.Index:
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dim)
+    if index_type == "hnsw_sq8":
+        return faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, VECTOR_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+    if index_type == "ivfpq":
+        nlist = max(1, int(math.sqrt(n)))
+        quantizer = faiss.IndexFlatIP(dim)
+        ivfpq = faiss.IndexIVFPQ(quantizer, dim, nlist, VECTOR_PQ_M, 8, faiss.METRIC_INNER_PRODUCT)
+        # PQ distances only pick candidates; the final order uses the exact vectors
+        return faiss.IndexRefineFlat(ivfpq)
+    raise ValueError(f"Unknown VECTOR_INDEX_TYPE: {index_type!r}")
+
+
+def _set_search_params(index: faiss.Index):
+    """Apply the query-time knobs (also after load_local)."""
+    if isinstance(index, faiss.IndexRefine):
+        index.k_factor = VECTOR_REFINE_K_FACTOR
+        index = faiss.downcast_index(index.base_index)
+    if isinstance(index, faiss.IndexHNSW):
+        index.hnsw.efSearch = VECTOR_EF_SEARCH
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = VECTOR_IVF_NPROBE
+
+
+def _sampled_recall(index: faiss.Index, matrix: np.ndarray) -> float:
+    """recall@10 of `index` against the exact scan, for a sample of the chunks as queries."""
+    n = len(matrix)
+    k = min(_RECALL_K, n)
+    rng = np.random.default_rng(0)
+    queries = matrix[rng.choice(n, size=min(_RECALL_SAMPLE, n), replace=False)]
+
+    exact = np.argpartition(queries @ matrix.T, -k, axis=1)[:, -k:]
+    _, found = index.search(queries, k)
+    hits = sum(len(set(e) & set(f)) for e, f in zip(exact.tolist(), found.tolist()))
+    return hits / (len(queries) * k)
+
+
+def build_vectorstore(
+    texts: list[str],
+    vectors: list[list[float]],
+    embedding: Embeddings,
+    metadatas: list[dict],
+) -> FAISS:
+    """Build the policy store from precomputed embeddings (CPU-bound; run off the event loop)."""
+    matrix = np.asarray(vectors, dtype=np.float32)
+    faiss.normalize_L2(matrix)
+
+    n, dim = matrix.shape
+    index_type = _resolve_index_type(VECTOR_INDEX_TYPE, n, dim)
+
+    def populate(index_type: str) -> FAISS:
+        index = _create_index(n, dim, index_type)
+        if index_type == "ivfpq" and n > _IVFPQ_TRAIN_SAMPLE:
+            sample = np.random.default_rng(0).choice(n, size=_IVFPQ_TRAIN_SAMPLE, replace=False)
+            index.train(matrix[sample])
+        else:
+            index.train(matrix)
+        _set_search_params(index)
+        store = FAISS(embedding, index, InMemoryDocstore(), {}, **_STORE_KWARGS)
+        store.add_embeddings(zip(texts, matrix), metadatas)
+        return store
+
+    store = populate(index_type)
+    if index_type != "flat":
+        recall = _sampled_recall(store.index, matrix)
+        logger.info("%s index recall@%s on %s chunks: %.3f", index_type, _RECALL_K, n, recall)
+        if recall < VECTOR_MIN_RECALL:
+            logger.warning("Recall below %s — using the exact flat index instead", VECTOR_MIN_RECALL)
+            store = populate("flat")
+    return store
+
+
+def load_vectorstore(folder_path: str, embedding: Embeddings) -> FAISS:
+    """Load a store written by `FAISS.save_local` (no embeddings calls)."""
+    # index.pkl is our own file in INDEX_DIR, written by save_local
+    store = FAISS.load_local(folder_path, embedding, allow_dangerous_deserialization=True, **_STORE_KWARGS)
+    _set_search_params(store.index)
+    return store